@@ -1,6 +1,5 @@
 from __future__ import annotations
 
-import time
 from pathlib import Path
 
 import typer
@@ -8,13 +7,26 @@ import typer
 from . import db as dbmod
 from .ingest import refresh as refresh_impl
 from .paths import db_path, default_data_dir, default_sessions_dir
-from .search import search as search_impl
-from .util import json_dumps_compact
 from .render import COLOR_MODES, OUTPUT_FORMATS, render_search_results, render_sessions
-
+from .search import search as search_impl
+from .util import json_dumps_fast
 
 app = typer.Typer(add_completion=False, no_args_is_help=True)
 
+# SQL equivalent of `datetime.isoformat()` for naive TIMESTAMPs (fractional part only when set).
+_ISO_TS_SQL = (
+    "CASE WHEN epoch_us({col}) % 1000000 = 0 THEN strftime({col}, '%Y-%m-%dT%H:%M:%S') "
+    "ELSE strftime({col}, '%Y-%m-%dT%H:%M:%S.%f') END"
+)
+
+
+@app.callback()
+def _main(ctx: typer.Context) -> None:
+    # Release pooled read-only handles (and their file lock) as soon as the command is done,
+    # rather than at interpreter exit, so a refresh in another process isn't kept waiting.
+    ctx.call_on_close(dbmod.close_all)
+
+
 def _normalize_choice(value: str, allowed: tuple[str, ...], flag: str) -> str:
     v = (value or "").strip().lower()
     if v in allowed:
@@ -30,18 +42,18 @@ def _open_db_ro(data_dir: Path):
         raise typer.Exit(code=1)
     # DuckDB takes an exclusive lock even for read-only connections while a writer is active.
     # We retry briefly to make `prompt-search search` resilient if a refresh just finished.
-    last_err: Exception | None = None
-    for _ in range(40):  # ~4s total
-        try:
-            return dbmod.connect_read_only(p)
-        except Exception as e:
-            msg = str(e)
-            if "Conflicting lock is held" not in msg:
-                raise
-            last_err = e
-            time.sleep(0.1)
-    typer.echo(f"database is busy (locked); try again in a moment: {last_err}", err=True)
-    raise typer.Exit(code=1)
+    try:
+        con = dbmod.open_with_backoff(lambda: dbmod.pooled_read_only(p))
+    except Exception as e:
+        if not dbmod.is_lock_conflict(e):
+            raise
+        typer.echo(f"database is busy (locked); try again in a moment: {e}", err=True)
+        raise typer.Exit(code=1) from None
+    # Read-only connections can't migrate; older layouts are rebuilt by the next refresh.
+    if dbmod.get_setting(con, "schema_version") != str(dbmod.SCHEMA_VERSION):
+        typer.echo(f"database at {p} uses an older schema; run `prompt-search refresh` first", err=True)
+        raise typer.Exit(code=1)
+    return con
 
 
 @app.command()
@@ -67,6 +79,7 @@ def refresh(
         include_assistant_in_ingest=True,
         include_internal_in_ingest=True,
         verbose=verbose,
+        parallel=True,
     )
 
     typer.echo(
@@ -102,37 +115,27 @@ def list_sessions(
     color = _normalize_choice(color, COLOR_MODES, "--color")
     con = _open_db_ro(ddir)
 
-    rows = con.execute(
-        """
-        SELECT
-          s.session_id,
-          s.first_ts,
-          s.last_ts,
-          s.cwd,
-          COUNT(CASE WHEN d.role = 'user' AND d.kind IN ('message_content','message_summary') THEN 1 END) AS user_docs,
-          COUNT(CASE WHEN d.role = 'assistant' AND d.kind IN ('message_content','message_summary') THEN 1 END) AS assistant_docs,
-          COUNT(CASE WHEN d.kind NOT IN ('message_content','message_summary') THEN 1 END) AS internal_docs
-        FROM sessions s
-        LEFT JOIN docs d ON d.session_id = s.session_id
-        GROUP BY 1,2,3,4
-        ORDER BY s.last_ts DESC NULLS LAST
-        LIMIT ?
-        """,
-        [limit],
-    ).fetchall()
-
-    out = []
-    for sid, first_ts, last_ts, cwd, user_docs, assistant_docs, internal_docs in rows:
-        item = {
-            "session_id": sid,
-            "first_ts": first_ts.isoformat() if first_ts else None,
-            "last_ts": last_ts.isoformat() if last_ts else None,
-            "cwd": cwd,
-            "user_docs": int(user_docs or 0),
-            "assistant_docs": int(assistant_docs or 0),
-            "internal_docs": int(internal_docs or 0),
-        }
-        out.append(item)
+    # Counts are maintained by refresh (every current-schema database has them, see
+    # ensure_schema), so there is no scan/aggregate over docs here.
+    sql = f"""
+    SELECT
+      s.session_id,
+      {_ISO_TS_SQL.format(col="s.first_ts")} AS first_ts,
+      {_ISO_TS_SQL.format(col="s.last_ts")} AS last_ts,
+      s.cwd,
+      COALESCE(c.user_docs, 0) AS user_docs,
+      COALESCE(c.assistant_docs, 0) AS assistant_docs,
+      COALESCE(c.internal_docs, 0) AS internal_docs
+    FROM sessions s
+    LEFT JOIN session_counts c ON c.session_id = s.session_id
+    ORDER BY s.last_ts DESC NULLS LAST
+    LIMIT ?
+    """
+    cur = con.execute(sql, [limit])
+    # Timestamps are formatted and counts typed (COUNT() is never NULL) in SQL, so rows can be
+    # zipped straight into dicts without any per-field coercion.
+    cols = [c[0] for c in cur.description]
+    out = [dict(zip(cols, r)) for r in cur.fetchall()]
 
     rendered = render_sessions(rows=out, output_format=output_format, color=color)
     if rendered is not None:
@@ -203,6 +206,7 @@ def search(
             include_assistant_in_ingest=True,
             include_internal_in_ingest=True,
             verbose=False,
+            parallel=True,
         )
 
     con = _open_db_ro(ddir)
@@ -220,65 +224,27 @@ def search(
     # Resolve the content to display per row.
     if full_content:
         # renderer will use .snippet; override snippet with full text for display
-        results = [
-            type(r)(
-                doc_id=r.doc_id,
-                session_id=r.session_id,
-                event_ts=r.event_ts,
-                role=r.role,
-                kind=r.kind,
-                file_path=r.file_path,
-                line_no=r.line_no,
-                score=r.score,
-                match_pos=r.match_pos,
-                snippet=(r.text or r.snippet),
-                text=r.text,
-            )
-            for r in results
-        ]
+        results = [r._replace(snippet=(r.text or r.snippet)) for r in results]
     elif context_lines > 0:
         from .search import extract_context_lines
 
         results = [
-            type(r)(
-                doc_id=r.doc_id,
-                session_id=r.session_id,
-                event_ts=r.event_ts,
-                role=r.role,
-                kind=r.kind,
-                file_path=r.file_path,
-                line_no=r.line_no,
-                score=r.score,
-                match_pos=r.match_pos,
-                snippet=extract_context_lines(r.text or r.snippet, query, context_lines),
-                text=r.text,
-            )
+            r._replace(snippet=extract_context_lines(r.text or r.snippet, query, context_lines))
             for r in results
         ]
 
     # Apply snippet length clamp at the presentation layer to keep search logic simple.
-    if (not full_content) and context_lines == 0 and snippet_len != 180:
-        trimmed = []
-        for r in results:
-            if len(r.snippet) <= snippet_len:
-                trimmed.append(r)
-            else:
-                trimmed.append(
-                    type(r)(
-                        doc_id=r.doc_id,
-                        session_id=r.session_id,
-                        event_ts=r.event_ts,
-                        role=r.role,
-                        kind=r.kind,
-                        file_path=r.file_path,
-                        line_no=r.line_no,
-                        score=r.score,
-                        match_pos=r.match_pos,
-                        snippet=r.snippet[: snippet_len - 1] + "…",
-                        text=r.text,
-                    )
-                )
-        results = trimmed
+    # Usually nothing needs trimming (e.g. a larger --snippet-len); keep the list as is then.
+    if (
+        (not full_content)
+        and context_lines == 0
+        and snippet_len != 180
+        and any(len(r.snippet) > snippet_len for r in results)
+    ):
+        results = [
+            r._replace(snippet=r.snippet[: snippet_len - 1] + "…") if len(r.snippet) > snippet_len else r
+            for r in results
+        ]
 
     rendered = render_search_results(
         results=results,
@@ -298,7 +264,12 @@ def debug_db(
     """Print a few DB stats (useful for troubleshooting)."""
     ddir = (data_dir or default_data_dir()).expanduser()
     con = _open_db_ro(ddir)
-    fts = dbmod.is_fts_available(con)
-    docs = con.execute("SELECT COUNT(*) FROM docs").fetchone()[0]
-    sessions = con.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
-    typer.echo(json_dumps_compact({"fts_available": fts, "docs": int(docs), "sessions": int(sessions)}))
+    fts, docs, sessions = con.execute(
+        """
+        SELECT
+          (SELECT value FROM settings WHERE key = 'fts_available'),
+          (SELECT COUNT(*) FROM docs),
+          (SELECT COUNT(*) FROM sessions)
+        """
+    ).fetchone()
+    typer.echo(json_dumps_fast({"fts_available": fts == "1", "docs": int(docs), "sessions": int(sessions)}))
@@ -1,15 +1,35 @@
 from __future__ import annotations
 
+import atexit
+import os
+import random
+import threading
+import time
+import weakref
 from dataclasses import dataclass
+from datetime import datetime
 from pathlib import Path
-from typing import Any, Iterable
+from typing import Any, Callable, Iterable
 
 import duckdb
 
 from .util import utcnow
 
+try:
+    import pyarrow as pa
+except ImportError:
+    # Optional: without pyarrow, bulk inserts fall back to multi-row VALUES statements.
+    pa = None
 
-SCHEMA_VERSION = 1
+
+SCHEMA_VERSION = 4
+
+# Tables derived entirely from the session files. When SCHEMA_VERSION changes they are dropped
+# and the next refresh re-ingests everything, instead of migrating row by row.
+_DERIVED_TABLES = ("docs", "docs_text", "fts_pending", "sessions", "session_files", "session_counts")
+
+# FTS index schemas created by older versions (v2 indexed `docs` directly).
+_FTS_SCHEMAS = ("fts_main_docs", "fts_main_docs_text")
 
 
 @dataclass(frozen=True)
@@ -18,8 +38,63 @@ class DbPaths:
     db_file: Path
 
 
+def is_lock_conflict(err: Exception) -> bool:
+    return "Conflicting lock is held" in str(err)
+
+
+def open_with_backoff(
+    opener: Callable[[], duckdb.DuckDBPyConnection], *, timeout: float = 4.0
+) -> duckdb.DuckDBPyConnection:
+    """
+    Call `opener` until it stops failing with a DuckDB lock conflict, or re-raise the last
+    lock error once `timeout` seconds have passed.
+
+    Delays start at 5ms (a writer that is just finishing is picked up almost immediately) and
+    double up to 250ms, with jitter so concurrent readers don't retry in lockstep.
+    """
+    delay = 0.005
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            return opener()
+        except Exception as e:
+            if not is_lock_conflict(e):
+                raise
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise
+        time.sleep(min(delay + random.uniform(0, delay), remaining))
+        delay = min(delay * 2, 0.25)
+
+
+# Settings for the writer connection (refresh). Nothing relies on the physical row order of
+# inserted data (every read orders explicitly), so DuckDB may insert and rebuild the FTS index
+# in parallel without preserving it. `threads` and `memory_limit` already default to the core
+# count and 80% of RAM, and spills go to `db.duckdb.tmp` in the data dir; the environment
+# variables below override the first two (e.g. on a shared machine). Read-only connections
+# keep the defaults.
+_WRITE_CONFIG = {"preserve_insertion_order": False}
+_WRITE_CONFIG_ENV = {
+    "threads": "PROMPT_SEARCH_THREADS",
+    "memory_limit": "PROMPT_SEARCH_MEMORY_LIMIT",
+}
+
+
+def _write_config() -> dict[str, Any]:
+    config: dict[str, Any] = dict(_WRITE_CONFIG)
+    for key, env in _WRITE_CONFIG_ENV.items():
+        # Passed through as strings; DuckDB parses and validates them ("4", "2GB").
+        value = os.environ.get(env)
+        if value:
+            config[key] = value
+    return config
+
+
 def connect(db_file: Path) -> duckdb.DuckDBPyConnection:
-    return duckdb.connect(str(db_file))
+    # DuckDB refuses to open the same file with a different configuration in one process,
+    # so drop any pooled read-only handles before opening for writes (see pooled_read_only).
+    release_read_only(db_file)
+    return duckdb.connect(str(db_file), config=_write_config())
 
 
 def connect_read_only(db_file: Path) -> duckdb.DuckDBPyConnection:
@@ -27,6 +102,69 @@ def connect_read_only(db_file: Path) -> duckdb.DuckDBPyConnection:
     return duckdb.connect(str(db_file), read_only=True)
 
 
+# Pooled read-only handles, one per (database file, thread): DuckDB connections must not be
+# used from several threads at once. A pooled handle holds the file lock, so a refresh in
+# another process waits until it is released; the CLI releases the pool when each command
+# finishes, and long-lived callers should call `release_read_only`/`close_all` once done.
+_RO_POOL: dict[tuple[Path, int], duckdb.DuckDBPyConnection] = {}
+_RO_POOL_LOCK = threading.Lock()
+
+
+def _pool_key(db_file: Path) -> Path:
+    return db_file.expanduser().resolve()
+
+
+def _is_open(con: duckdb.DuckDBPyConnection) -> bool:
+    try:
+        con.execute("SELECT 1")
+    except duckdb.ConnectionException:
+        return False
+    return True
+
+
+def pooled_read_only(db_file: Path) -> duckdb.DuckDBPyConnection:
+    """
+    `connect_read_only`, but repeated calls from one thread share a handle, skipping DuckDB's
+    open cost (`search --auto-refresh`, scripted callers). The pool owns it: a handle that a
+    caller closed anyway is replaced on the next call. `connect` to the same file in this
+    process closes the file's pooled handles, so re-fetch after writing.
+    """
+    key = (_pool_key(db_file), threading.get_ident())
+    with _RO_POOL_LOCK:
+        con = _RO_POOL.get(key)
+    if con is not None and _is_open(con):
+        return con
+    con = connect_read_only(db_file)
+    with _RO_POOL_LOCK:
+        _RO_POOL[key] = con
+    return con
+
+
+def is_pooled_read_only(con: duckdb.DuckDBPyConnection) -> bool:
+    # True for handles handed out by pooled_read_only and not yet released.
+    with _RO_POOL_LOCK:
+        return any(c is con for c in _RO_POOL.values())
+
+
+def release_read_only(db_file: Path) -> None:
+    path = _pool_key(db_file)
+    with _RO_POOL_LOCK:
+        cons = [_RO_POOL.pop(k) for k in [k for k in _RO_POOL if k[0] == path]]
+    for con in cons:
+        con.close()
+
+
+def close_all() -> None:
+    with _RO_POOL_LOCK:
+        cons = list(_RO_POOL.values())
+        _RO_POOL.clear()
+    for con in cons:
+        con.close()
+
+
+atexit.register(close_all)
+
+
 def ensure_schema(con: duckdb.DuckDBPyConnection) -> None:
     con.execute(
         """
@@ -36,6 +174,7 @@ def ensure_schema(con: duckdb.DuckDBPyConnection) -> None:
         );
         """
     )
+    _drop_outdated_tables(con)
 
     con.execute(
         """
@@ -45,6 +184,7 @@ def ensure_schema(con: duckdb.DuckDBPyConnection) -> None:
           size BIGINT NOT NULL,
           mtime TIMESTAMP NOT NULL,
           mtime_epoch DOUBLE,
+          mtime_ns BIGINT,
           last_offset BIGINT NOT NULL,
           last_line_no BIGINT NOT NULL,
           last_seen_at TIMESTAMP NOT NULL
@@ -55,6 +195,7 @@ def ensure_schema(con: duckdb.DuckDBPyConnection) -> None:
     # Backfill / forward-compat: older DBs may be missing new columns.
     try:
         con.execute("ALTER TABLE session_files ADD COLUMN IF NOT EXISTS mtime_epoch DOUBLE;")
+        con.execute("ALTER TABLE session_files ADD COLUMN IF NOT EXISTS mtime_ns BIGINT;")
     except Exception:
         # If ALTER isn't supported for some reason, we can still operate without mtime_epoch,
         # but refresh will be less efficient.
@@ -79,7 +220,7 @@ def ensure_schema(con: duckdb.DuckDBPyConnection) -> None:
     con.execute(
         """
         CREATE TABLE IF NOT EXISTS docs (
-          doc_id VARCHAR PRIMARY KEY,
+          doc_id BIGINT PRIMARY KEY,
           session_id VARCHAR,
           file_path VARCHAR NOT NULL,
           line_no BIGINT NOT NULL,
@@ -87,12 +228,44 @@ def ensure_schema(con: duckdb.DuckDBPyConnection) -> None:
           event_type VARCHAR,
           inner_type VARCHAR,
           role VARCHAR,
-          kind VARCHAR NOT NULL,
+          kind VARCHAR NOT NULL
+        );
+        """
+    )
+
+    # Message text lives in its own table so scans over doc metadata (counts, filters,
+    # session aggregates) don't drag the text bytes along. Rows share doc_id with `docs`.
+    # `text_lower` is `text.lower()` (Python's, so queries lowered the same way always match),
+    # stored so substring search doesn't re-lower every row per query.
+    con.execute(
+        """
+        CREATE TABLE IF NOT EXISTS docs_text (
+          doc_id BIGINT PRIMARY KEY,
           text VARCHAR NOT NULL,
-          text_len BIGINT NOT NULL
+          text_len BIGINT NOT NULL,
+          text_lower VARCHAR NOT NULL
+        );
+        """
+    )
+
+    # Docs inserted since the FTS index was last built or updated (see update_fts_index).
+    con.execute("CREATE TABLE IF NOT EXISTS fts_pending (doc_id BIGINT PRIMARY KEY);")
+
+    # Per-session doc counts, maintained incrementally by refresh so `list-sessions` doesn't
+    # have to aggregate the whole docs table.
+    con.execute(
+        """
+        CREATE TABLE IF NOT EXISTS session_counts (
+          session_id VARCHAR PRIMARY KEY,
+          user_docs BIGINT NOT NULL,
+          assistant_docs BIGINT NOT NULL,
+          internal_docs BIGINT NOT NULL
         );
         """
     )
+    if get_setting(con, "session_counts_ready") != "1":
+        # Backfill for databases created before session_counts existed.
+        refresh_session_counts(con)
 
     # Set schema version if missing.
     cur = con.execute("SELECT value FROM settings WHERE key = 'schema_version'").fetchone()
@@ -103,6 +276,21 @@ def ensure_schema(con: duckdb.DuckDBPyConnection) -> None:
         )
 
 
+def _drop_outdated_tables(con: duckdb.DuckDBPyConnection) -> None:
+    row = con.execute("SELECT value FROM settings WHERE key = 'schema_version'").fetchone()
+    if row is None or row[0] == str(SCHEMA_VERSION):
+        return
+    for schema in _FTS_SCHEMAS:
+        con.execute(f"DROP SCHEMA IF EXISTS {schema} CASCADE")
+    for table in _DERIVED_TABLES:
+        con.execute(f"DROP TABLE IF EXISTS {table}")
+    con.execute(
+        "DELETE FROM settings WHERE key IN ('fts_index_ready', 'fts_reindexed_at', 'session_counts_ready')"
+    )
+    _FTS_STATE.pop(con, None)
+    set_setting(con, "schema_version", str(SCHEMA_VERSION))
+
+
 def set_setting(con: duckdb.DuckDBPyConnection, key: str, value: str) -> None:
     con.execute(
         """
@@ -111,6 +299,8 @@ def set_setting(con: duckdb.DuckDBPyConnection, key: str, value: str) -> None:
         """,
         [key, value],
     )
+    if key in _FTS_STATE_KEYS:
+        _FTS_STATE.pop(con, None)
 
 
 def get_setting(con: duckdb.DuckDBPyConnection, key: str) -> str | None:
@@ -120,20 +310,98 @@ def get_setting(con: duckdb.DuckDBPyConnection, key: str) -> str | None:
     return row[0]
 
 
+_SESSION_COUNTS_SELECT = """
+    SELECT
+      session_id,
+      COUNT(CASE WHEN role = 'user' AND kind IN ('message_content','message_summary') THEN 1 END),
+      COUNT(CASE WHEN role = 'assistant' AND kind IN ('message_content','message_summary') THEN 1 END),
+      COUNT(CASE WHEN kind NOT IN ('message_content','message_summary') THEN 1 END)
+    FROM docs
+    WHERE session_id IS NOT NULL {extra}
+    GROUP BY session_id
+"""
+
+
+# refresh_session_counts recomputes all sessions when asked for more than this many.
+SESSION_COUNTS_FILTER_MAX = 500
+
+
+def refresh_session_counts(
+    con: duckdb.DuckDBPyConnection, session_ids: Iterable[str] | None = None
+) -> None:
+    """Recompute `session_counts` rows for `session_ids`, or for every session when None."""
+    if session_ids is None:
+        con.execute("DELETE FROM session_counts")
+        con.execute("INSERT INTO session_counts " + _SESSION_COUNTS_SELECT.format(extra=""))
+        set_setting(con, "session_counts_ready", "1")
+        return
+
+    ids = sorted(set(session_ids))
+    if not ids:
+        return
+    if len(ids) > SESSION_COUNTS_FILTER_MAX:
+        # Either way every doc is scanned; past this many sessions the filter saves little.
+        refresh_session_counts(con)
+        return
+    # Semi-join against a temp table of the ids. Binding them as one list parameter is slow to
+    # convert, and list_contains over it costs O(docs x ids).
+    con.execute("CREATE OR REPLACE TEMP TABLE _ps_sessions (session_id VARCHAR)")
+    insert_rows(con, "_ps_sessions", ("session_id",), ((sid,) for sid in ids))
+    in_ids = "session_id IN (SELECT session_id FROM _ps_sessions)"
+    con.execute(f"DELETE FROM session_counts WHERE {in_ids}")
+    con.execute("INSERT INTO session_counts " + _SESSION_COUNTS_SELECT.format(extra=f"AND {in_ids}"))
+    con.execute("DROP TABLE _ps_sessions")
+
+
+def get_settings(con: duckdb.DuckDBPyConnection, keys: tuple[str, ...]) -> dict[str, str]:
+    # One statement for several keys: DuckDB has no client-side prepared statements to reuse
+    # here, so the per-statement round trip is what we can save. Missing keys are omitted.
+    placeholders = ", ".join(["?"] * len(keys))
+    rows = con.execute(
+        f"SELECT key, value FROM settings WHERE key IN ({placeholders})", list(keys)
+    ).fetchall()
+    return dict(rows)
+
+
+# (fts_available, fts_index_ready) per connection, so repeated searches on a pooled handle
+# skip the settings lookup. set_setting drops the entry whenever either key is written.
+_FTS_STATE_KEYS = ("fts_available", "fts_index_ready")
+_FTS_STATE: weakref.WeakKeyDictionary[duckdb.DuckDBPyConnection, tuple[bool, bool]] = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def fts_state(con: duckdb.DuckDBPyConnection) -> tuple[bool, bool]:
+    state = _FTS_STATE.get(con)
+    if state is None:
+        settings = get_settings(con, _FTS_STATE_KEYS)
+        state = (settings.get("fts_available") == "1", settings.get("fts_index_ready") == "1")
+        _FTS_STATE[con] = state
+    return state
+
+
 def mark_fts_available(con: duckdb.DuckDBPyConnection, available: bool) -> None:
     set_setting(con, "fts_available", "1" if available else "0")
 
 
 def is_fts_available(con: duckdb.DuckDBPyConnection) -> bool:
-    v = get_setting(con, "fts_available")
-    return v == "1"
+    return fts_state(con)[0]
+
+
+# Connections that have loaded the extension; LOAD lasts for the connection's lifetime.
+_FTS_LOADED: weakref.WeakSet[duckdb.DuckDBPyConnection] = weakref.WeakSet()
 
 
 def try_enable_fts(con: duckdb.DuckDBPyConnection) -> bool:
+    # Already loaded here and still recorded as available: nothing to do (or write).
+    if con in _FTS_LOADED and fts_state(con)[0]:
+        return True
+
     # DuckDB FTS is an extension. We try LOAD first, and INSTALL+LOAD if needed.
     try:
         con.execute("LOAD fts")
         mark_fts_available(con, True)
+        _FTS_LOADED.add(con)
         return True
     except Exception:
         pass
@@ -142,6 +410,7 @@ def try_enable_fts(con: duckdb.DuckDBPyConnection) -> bool:
         con.execute("INSTALL fts")
         con.execute("LOAD fts")
         mark_fts_available(con, True)
+        _FTS_LOADED.add(con)
         return True
     except Exception:
         mark_fts_available(con, False)
@@ -150,16 +419,264 @@ def try_enable_fts(con: duckdb.DuckDBPyConnection) -> bool:
 
 def rebuild_fts_index(con: duckdb.DuckDBPyConnection) -> None:
     # If the extension isn't available, this will raise; callers should guard.
-    # DuckDB's FTS index must be rebuilt after inserts/updates.
-    con.execute("PRAGMA create_fts_index('docs', 'doc_id', 'text', overwrite=1)")
+    con.execute("PRAGMA create_fts_index('docs_text', 'doc_id', 'text', overwrite=1)")
+    con.execute("DELETE FROM fts_pending")
     set_setting(con, "fts_reindexed_at", utcnow().isoformat())
     set_setting(con, "fts_index_ready", "1")
 
 
-def exec_many(
-    con: duckdb.DuckDBPyConnection, sql: str, rows: Iterable[Iterable[Any]]
-) -> None:
-    # `executemany` exists but isn't always surfaced consistently; using execute in a loop
-    # is OK for our scale (tens of thousands of rows) inside a transaction.
+# Rebuild from scratch instead of appending once this share of docs is unindexed.
+FTS_INCREMENTAL_MAX_FRACTION = 0.2
+
+# Appends the docs listed in fts_pending to the index tables, mirroring what
+# create_fts_index computes (porter stemming, English stopwords applied before stemming,
+# per-term document frequency, per-doc length, corpus stats) so BM25 scores come out the
+# same as after a full rebuild.
+_FTS_APPEND_SQL = (
+    """
+    CREATE OR REPLACE TEMP TABLE _fts_new AS
+    SELECT
+      (SELECT COALESCE(MAX(docid), -1) FROM fts_main_docs_text.docs) + row_number() OVER () AS docid,
+      t.doc_id AS name,
+      t.text
+    FROM fts_pending p
+    JOIN docs_text t ON t.doc_id = p.doc_id
+    WHERE NOT EXISTS (SELECT 1 FROM fts_main_docs_text.docs f WHERE f.name = t.doc_id)
+    """,
+    """
+    CREATE OR REPLACE TEMP TABLE _fts_new_terms AS
+    SELECT docid, stem(w, 'porter') AS term
+    FROM (SELECT docid, unnest(fts_main_docs_text.tokenize(text)) AS w FROM _fts_new)
+    WHERE w IS NOT NULL AND len(w) > 0
+      AND w NOT IN (SELECT sw FROM fts_main_docs_text.stopwords)
+    """,
+    """
+    INSERT INTO fts_main_docs_text.dict (termid, term, df)
+    SELECT (SELECT COALESCE(MAX(termid), -1) FROM fts_main_docs_text.dict) + row_number() OVER (), term, 0
+    FROM (
+      SELECT DISTINCT term FROM _fts_new_terms
+      WHERE term NOT IN (SELECT term FROM fts_main_docs_text.dict)
+    )
+    """,
+    """
+    UPDATE fts_main_docs_text.dict AS d
+    SET df = d.df + n.df
+    FROM (SELECT term, COUNT(DISTINCT docid) AS df FROM _fts_new_terms GROUP BY term) AS n
+    WHERE d.term = n.term
+    """,
+    """
+    INSERT INTO fts_main_docs_text.terms (docid, fieldid, termid)
+    SELECT n.docid, 0, d.termid
+    FROM _fts_new_terms n
+    JOIN fts_main_docs_text.dict d ON d.term = n.term
+    """,
+    """
+    INSERT INTO fts_main_docs_text.docs (docid, name, len)
+    SELECT f.docid, f.name, COUNT(n.term)
+    FROM _fts_new f
+    LEFT JOIN _fts_new_terms n ON n.docid = f.docid
+    GROUP BY f.docid, f.name
+    """,
+    """
+    UPDATE fts_main_docs_text.stats
+    SET num_docs = s.num_docs, avgdl = s.avgdl
+    FROM (SELECT COUNT(docid) AS num_docs, SUM(len) / COUNT(len) AS avgdl FROM fts_main_docs_text.docs) AS s
+    """,
+    "DROP TABLE _fts_new",
+    "DROP TABLE _fts_new_terms",
+    "DELETE FROM fts_pending",
+)
+
+
+def update_fts_index(con: duckdb.DuckDBPyConnection, *, full: bool = False) -> bool:
+    """
+    Bring the FTS index up to date with newly inserted docs. Returns True if the index was
+    extended in place, False if it was rebuilt.
+
+    Appending is O(new docs) but can't drop entries, so callers pass `full=True` whenever docs
+    were deleted. A missing/stale index or a large backlog also falls back to a full rebuild.
+    """
+    if not full and get_setting(con, "fts_index_ready") == "1":
+        pending, indexed = con.execute(
+            "SELECT (SELECT COUNT(*) FROM fts_pending), (SELECT num_docs FROM fts_main_docs_text.stats)"
+        ).fetchone()
+        if indexed and pending <= indexed * FTS_INCREMENTAL_MAX_FRACTION:
+            con.execute("BEGIN TRANSACTION")
+            try:
+                for sql in _FTS_APPEND_SQL:
+                    con.execute(sql)
+                con.execute("COMMIT")
+            except Exception:
+                con.execute("ROLLBACK")
+                raise
+            set_setting(con, "fts_reindexed_at", utcnow().isoformat())
+            return True
+    rebuild_fts_index(con)
+    return False
+
+
+DOC_COLUMNS = (
+    "doc_id",
+    "session_id",
+    "file_path",
+    "line_no",
+    "event_ts",
+    "event_type",
+    "inner_type",
+    "role",
+    "kind",
+    "text",
+    "text_len",
+)
+
+# How DOC_COLUMNS split across the two tables; `text_lower` is derived on insert.
+DOC_META_COLUMNS = DOC_COLUMNS[:-2]
+DOC_TEXT_COLUMNS = ("doc_id", "text", "text_len", "text_lower")
+
+# Rows per multi-row INSERT. Large enough to amortize parse/plan, small enough to keep the
+# bound parameter list (rows * columns) modest.
+INSERT_BATCH_ROWS = 500
+
+
+def insert_rows(
+    con: duckdb.DuckDBPyConnection,
+    table: str,
+    columns: tuple[str, ...],
+    rows: Iterable[tuple[Any, ...]],
+    *,
+    or_ignore: bool = False,
+    on_conflict: str = "",
+    batch_size: int = INSERT_BATCH_ROWS,
+) -> int:
+    # DuckDB's Python API has no Appender, and both per-row `execute` and `executemany` still
+    # bind and execute row by row. A multi-row VALUES list executes a whole batch per statement.
+    # `on_conflict` is an optional trailing ON CONFLICT clause (an upsert).
+    verb = "INSERT OR IGNORE INTO" if or_ignore else "INSERT INTO"
+    head = f"{verb} {table}({', '.join(columns)}) VALUES "
+    placeholder = "(" + ", ".join(["?"] * len(columns)) + ")"
+    full_sql = head + ", ".join([placeholder] * batch_size) + on_conflict
+
+    n = 0
+    batch: list[tuple[Any, ...]] = []
     for r in rows:
-        con.execute(sql, list(r))
+        batch.append(r)
+        if len(batch) == batch_size:
+            con.execute(full_sql, [v for row in batch for v in row])
+            n += len(batch)
+            batch = []
+    if batch:
+        sql = head + ", ".join([placeholder] * len(batch)) + on_conflict
+        con.execute(sql, [v for row in batch for v in row])
+        n += len(batch)
+    return n
+
+
+def bulk_insert_arrow(con: duckdb.DuckDBPyConnection, targets: Any, arrow_table: Any) -> int:
+    """
+    Insert a pyarrow table into one or more tables. `targets` is a sequence of
+    (table, columns, or_ignore) tuples, each filled from the named columns of `arrow_table`.
+    """
+    # DuckDB scans a registered Arrow table in place, so the whole batch is inserted by a
+    # single vectorized INSERT ... SELECT per target without converting values one at a time.
+    con.register("_ps_batch", arrow_table)
+    try:
+        for table, columns, or_ignore in targets:
+            cols = ", ".join(columns)
+            verb = "INSERT OR IGNORE INTO" if or_ignore else "INSERT INTO"
+            con.execute(f"{verb} {table}({cols}) SELECT {cols} FROM _ps_batch")
+    finally:
+        con.unregister("_ps_batch")
+    return arrow_table.num_rows
+
+
+def _docs_arrow_schema() -> Any:
+    if pa is None:
+        return None
+    return pa.schema(
+        [
+            ("doc_id", pa.int64()),
+            ("session_id", pa.string()),
+            ("file_path", pa.string()),
+            ("line_no", pa.int64()),
+            # Aware instants; DuckDB converts them to local wall time on insert (see _arrow_ts).
+            ("event_ts", pa.timestamp("us", tz="UTC")),
+            ("event_type", pa.string()),
+            ("inner_type", pa.string()),
+            ("role", pa.string()),
+            ("kind", pa.string()),
+            ("text", pa.string()),
+            ("text_len", pa.int64()),
+            ("text_lower", pa.string()),
+        ]
+    )
+
+
+_DOCS_ARROW_SCHEMA = _docs_arrow_schema()
+
+
+def _doc_targets(or_ignore: bool) -> tuple[tuple[str, tuple[str, ...], bool], ...]:
+    return (
+        ("docs", DOC_META_COLUMNS, or_ignore),
+        ("docs_text", DOC_TEXT_COLUMNS, or_ignore),
+        # Always OR IGNORE: the fast path only knows that docs was empty, not fts_pending.
+        ("fts_pending", ("doc_id",), True),
+    )
+
+
+def _arrow_ts(values: list[datetime | None]) -> list[datetime | None]:
+    # DuckDB's own parameter binding stores aware datetimes as local wall time. The Arrow
+    # column is UTC-aware and the TIMESTAMPTZ -> TIMESTAMP cast on insert does the same
+    # conversion in bulk, so only naive values (already local time) need attaching a zone.
+    if all(t is None or t.tzinfo is not None for t in values):
+        return values
+    return [t.astimezone() if t is not None and t.tzinfo is None else t for t in values]
+
+
+def bulk_insert_docs(con: duckdb.DuckDBPyConnection, rows: Iterable[tuple[Any, ...]]) -> int:
+    """
+    Insert doc rows (ordered as `DOC_COLUMNS`) into `docs` and `docs_text`, skipping doc_ids
+    that already exist, and queue them in `fts_pending` for the next FTS update.
+    """
+    rows = list(rows)
+    if not rows:
+        return 0
+    return bulk_insert_doc_columns(con, [list(c) for c in zip(*rows)])
+
+
+def bulk_insert_doc_columns(
+    con: duckdb.DuckDBPyConnection, columns: list[list[Any]], *, or_ignore: bool = True
+) -> int:
+    """
+    `bulk_insert_docs` for data that is already column-major (one list per DOC_COLUMNS entry).
+    Pass `or_ignore=False` only when no doc_id in the batch can already exist in docs: the
+    plain INSERT skips the conflict handling, and a duplicate raises instead of being skipped.
+    The fts_pending queue is always filled with OR IGNORE.
+    """
+    if not columns or not columns[0]:
+        return 0
+    text_idx = DOC_COLUMNS.index("text")
+    columns = [*columns, [t.lower() for t in columns[text_idx]]]
+
+    if pa is None:
+        rows = list(zip(*columns))
+        n_meta = len(DOC_META_COLUMNS)
+        n = insert_rows(
+            con, "docs", DOC_META_COLUMNS, (r[:n_meta] for r in rows), or_ignore=or_ignore
+        )
+        insert_rows(
+            con,
+            "docs_text",
+            DOC_TEXT_COLUMNS,
+            ((r[0],) + r[n_meta:] for r in rows),
+            or_ignore=or_ignore,
+        )
+        insert_rows(con, "fts_pending", ("doc_id",), ((r[0],) for r in rows), or_ignore=True)
+        return n
+
+    ts_idx = DOC_COLUMNS.index("event_ts")
+    arrays = [
+        pa.array(_arrow_ts(c) if i == ts_idx else c, type=f.type)
+        for i, (c, f) in enumerate(zip(columns, _DOCS_ARROW_SCHEMA))
+    ]
+    tbl = pa.Table.from_arrays(arrays, schema=_DOCS_ARROW_SCHEMA)
+    return bulk_insert_arrow(con, _doc_targets(or_ignore), tbl)
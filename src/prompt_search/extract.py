@@ -1,30 +1,83 @@
 from __future__ import annotations
 
-from typing import Any, Iterable
+from typing import Any, Callable
 
-from .util import ExtractedDoc, json_dumps_pretty, parse_ts
+from .util import ExtractedDoc, hash_key, json_dumps_pretty, parse_ts
 
 
-def _iter_message_texts(content: Any) -> Iterable[str]:
-    if not isinstance(content, list):
-        return
-    for item in content:
-        if not isinstance(item, dict):
-            continue
-        txt = item.get("text")
-        if isinstance(txt, str) and txt.strip():
-            yield txt
+def _collect_texts(seq: Any) -> list[str]:
+    # Non-empty `text` fields of a message's `content` or `summary` list. Typically 1-3 items,
+    # so a list comprehension beats a generator frame here.
+    if not isinstance(seq, list):
+        return []
+    return [
+        txt
+        for item in seq
+        if isinstance(item, dict) and isinstance(txt := item.get("text"), str) and txt.strip()
+    ]
+
+
+# (role, kind, text) for each doc an event yields, in segment order.
+_Segment = tuple[str | None, str, str]
+
+
+def _message_segments(
+    payload: dict[str, Any], include_assistant: bool, include_internal: bool
+) -> list[_Segment]:
+    role = payload.get("role")
+    # We always ingest, but allow skipping now if desired.
+    if role == "assistant" and not include_assistant:
+        return []
+    role = role if isinstance(role, str) else None
+    segments = [(role, "message_content", txt) for txt in _collect_texts(payload.get("content"))]
+    # Some sessions store encrypted content but still include plaintext summary.
+    segments.extend(
+        (role, "message_summary", txt) for txt in _collect_texts(payload.get("summary"))
+    )
+    return segments
+
+
+def _reasoning_segments(
+    payload: dict[str, Any], include_assistant: bool, include_internal: bool
+) -> list[_Segment]:
+    if not include_internal:
+        return []
+    txt = payload.get("text")
+    return [(None, "agent_reasoning", txt)] if isinstance(txt, str) else []
 
 
-def _iter_summary_texts(summary: Any) -> Iterable[str]:
-    if not isinstance(summary, list):
-        return
-    for item in summary:
-        if not isinstance(item, dict):
-            continue
-        txt = item.get("text")
-        if isinstance(txt, str) and txt.strip():
-            yield txt
+def _item_completed_segments(
+    payload: dict[str, Any], include_assistant: bool, include_internal: bool
+) -> list[_Segment]:
+    if not include_internal:
+        return []
+    item = payload.get("item")
+    if not isinstance(item, dict):
+        return []
+    txt = item.get("text")
+    return [(None, "item_completed", txt)] if isinstance(txt, str) else []
+
+
+def _review_segments(
+    payload: dict[str, Any], include_assistant: bool, include_internal: bool
+) -> list[_Segment]:
+    if not include_internal:
+        return []
+    review_output = payload.get("review_output")
+    if review_output is None:
+        return []
+    return [(None, "review_output", json_dumps_pretty(review_output))]
+
+
+# Keyed by (event type, payload type). Anything else yields no docs; in particular
+# event_msg user_message/agent_message, which duplicate the response_item messages.
+_HANDLERS: dict[tuple[str, str], Callable[[dict[str, Any], bool, bool], list[_Segment]]] = {
+    ("response_item", "message"): _message_segments,
+    ("event_msg", "agent_reasoning"): _reasoning_segments,
+    ("event_msg", "item_completed"): _item_completed_segments,
+    ("event_msg", "exited_review_mode"): _review_segments,
+}
+_EVENT_TYPES = frozenset(event_type for event_type, _ in _HANDLERS)
 
 
 def extract_docs_from_event(
@@ -43,113 +96,45 @@ def extract_docs_from_event(
     so `refresh --user-only` style behaviors can be implemented later without schema changes.
     """
     event_type = event.get("type")
-    event_ts = parse_ts(event.get("timestamp"))
-    payload = event.get("payload")
-    out: list[ExtractedDoc] = []
-
-    def add_doc(*, seg_idx: int, role: str | None, kind: str, inner_type: str | None, text: str):
-        if not text.strip():
-            return
-        doc_id = f"{file_path}:{line_no}:{seg_idx}"
-        out.append(
-            ExtractedDoc(
-                doc_id=doc_id,
-                session_id=session_id_hint,
-                file_path=file_path,
-                line_no=line_no,
-                event_ts=event_ts,
-                event_type=event_type,
-                inner_type=inner_type,
-                role=role,
-                kind=kind,
-                text=text,
-            )
-        )
-
-    if event_type == "response_item" and isinstance(payload, dict):
-        inner_type = payload.get("type")
-        if inner_type == "message":
-            role = payload.get("role")
-            # We always ingest, but allow skipping now if desired.
-            if role == "assistant" and not include_assistant:
-                return []
-
-            seg_idx = 0
-            for txt in _iter_message_texts(payload.get("content")):
-                seg_idx += 1
-                add_doc(
-                    seg_idx=seg_idx,
-                    role=role if isinstance(role, str) else None,
-                    kind="message_content",
-                    inner_type=inner_type,
-                    text=txt,
-                )
-
-            # Some sessions store encrypted content but still include plaintext summary.
-            for txt in _iter_summary_texts(payload.get("summary")):
-                seg_idx += 1
-                add_doc(
-                    seg_idx=seg_idx,
-                    role=role if isinstance(role, str) else None,
-                    kind="message_summary",
-                    inner_type=inner_type,
-                    text=txt,
-                )
-
-        return out
-
-    if event_type == "event_msg" and isinstance(payload, dict):
-        inner_type = payload.get("type")
-        # Avoid duplicating user/assistant messages which typically exist as response_item already.
-        if inner_type in ("user_message", "agent_message"):
+    try:
+        # Fast path for the bulk of events (token counts, turn context, ...): one set lookup.
+        if event_type not in _EVENT_TYPES:
             return []
-        if inner_type == "agent_reasoning":
-            if not include_internal:
-                return []
-            txt = payload.get("text")
-            if isinstance(txt, str):
-                add_doc(
-                    seg_idx=1,
-                    role=None,
-                    kind="agent_reasoning",
-                    inner_type=inner_type,
-                    text=txt,
-                )
-            return out
-
-        if inner_type == "item_completed":
-            if not include_internal:
-                return []
-            item = payload.get("item")
-            if isinstance(item, dict):
-                txt = item.get("text")
-                if isinstance(txt, str):
-                    add_doc(
-                        seg_idx=1,
-                        role=None,
-                        kind="item_completed",
-                        inner_type=inner_type,
-                        text=txt,
-                    )
-            return out
-
-        if inner_type == "exited_review_mode":
-            if not include_internal:
-                return []
-            review_output = payload.get("review_output")
-            if review_output is not None:
-                add_doc(
-                    seg_idx=1,
-                    role=None,
-                    kind="review_output",
-                    inner_type=inner_type,
-                    text=json_dumps_pretty(review_output),
-                )
-            return out
+        payload = event.get("payload")
+        if not isinstance(payload, dict):
+            return []
+        inner_type = payload.get("type")
+        handler = _HANDLERS.get((event_type, inner_type))
+    except TypeError:
+        # Unhashable "type" values in malformed events.
+        return []
+    if handler is None:
+        return []
 
+    segments = handler(payload, include_assistant, include_internal)
+    if not segments:
         return []
 
-    return []
+    # Parsed only once we know the event yields docs; most events are discarded.
+    event_ts = parse_ts(event.get("timestamp"))
+    # "path:line:segment" keys (see `hash_key`), formatting the path and line once per event.
+    key_prefix = f"{file_path}:{line_no}:"
+    return [
+        ExtractedDoc(
+            doc_id=hash_key(key_prefix + str(seg_idx)),
+            session_id=session_id_hint,
+            file_path=file_path,
+            line_no=line_no,
+            event_ts=event_ts,
+            event_type=event_type,
+            inner_type=inner_type,
+            role=role,
+            kind=kind,
+            text=text,
+        )
+        for seg_idx, (role, kind, text) in enumerate(segments, start=1)
+        if text.strip()
+    ]
 
 
 def extract_session_meta(event: dict[str, Any]) -> dict[str, Any] | None:
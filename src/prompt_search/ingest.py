@@ -1,15 +1,28 @@
 from __future__ import annotations
 
 import json
+import multiprocessing
+import os
+import stat
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from dataclasses import dataclass
 from datetime import datetime
+from functools import partial
+from operator import attrgetter
 from pathlib import Path
-from typing import Any, Iterable
+from typing import Any, Callable, Iterator
 
 from . import db as dbmod
 from .paths import db_path
 from .extract import extract_docs_from_event, extract_session_meta
-from .util import ExtractedDoc, parse_ts, utcnow
+from .util import ExtractedDoc, json_loads, parse_ts, utcnow
+
+# Extracted docs are buffered across files and flushed to DuckDB in batches of this size:
+# large enough that most refreshes insert everything in one vectorized batch, small enough
+# to bound memory on a full re-ingest.
+DOC_BATCH_SIZE = 50_000
 
 
 @dataclass
@@ -24,92 +37,349 @@ class RefreshStats:
     fts_reindexed: bool = False
 
 
-def _iter_jsonl_paths(sessions_dir: Path) -> list[Path]:
+def _iter_jsonl_files(sessions_dir: Path) -> list[tuple[Path, os.stat_result]]:
+    # Each path is stat'ed exactly once; the result doubles as the is-a-file check and as
+    # the size/mtime that refresh compares against session_files.
     if not sessions_dir.exists():
         return []
+    out = []
     # Codex uses nested YYYY/MM/DD dirs, but we keep it generic.
-    return sorted(p for p in sessions_dir.rglob("*.jsonl") if p.is_file())
-
-
-def _delete_file_docs(con: Any, file_path: str) -> None:
-    con.execute("DELETE FROM docs WHERE file_path = ?", [file_path])
-
-
-def _upsert_session(con: Any, meta: dict[str, Any], event_ts_str: str | None) -> int:
+    for p in sessions_dir.rglob("*.jsonl"):
+        try:
+            st = p.stat()
+        except OSError:
+            # Broken symlink or file removed mid-scan.
+            continue
+        if stat.S_ISREG(st.st_mode):
+            out.append((p, st))
+    out.sort()
+    return out
+
+
+def _delete_file_docs(con: Any, file_path: str) -> set[str]:
+    # Returns the affected session ids so their cached counts can be recomputed.
+    for table in ("docs_text", "fts_pending"):
+        con.execute(
+            f"DELETE FROM {table} WHERE doc_id IN (SELECT doc_id FROM docs WHERE file_path = ?)",
+            [file_path],
+        )
+    rows = con.execute(
+        "DELETE FROM docs WHERE file_path = ? RETURNING session_id", [file_path]
+    ).fetchall()
+    return {sid for (sid,) in rows if sid}
+
+
+_SESSION_TEXT_FIELDS = ("cwd", "originator", "cli_version", "source", "model_provider", "instructions")
+_SESSION_COLUMNS = ("session_id", "first_ts", "last_ts") + _SESSION_TEXT_FIELDS
+
+# Keep first_ts/last_ts conservative; newer non-null metadata wins.
+_SESSION_UPSERT = """
+ON CONFLICT(session_id) DO UPDATE SET
+  first_ts = LEAST(COALESCE(sessions.first_ts, excluded.first_ts), excluded.first_ts),
+  last_ts = GREATEST(COALESCE(sessions.last_ts, excluded.last_ts), excluded.last_ts),
+  cwd = COALESCE(excluded.cwd, sessions.cwd),
+  originator = COALESCE(excluded.originator, sessions.originator),
+  cli_version = COALESCE(excluded.cli_version, sessions.cli_version),
+  source = COALESCE(excluded.source, sessions.source),
+  model_provider = COALESCE(excluded.model_provider, sessions.model_provider),
+  instructions = COALESCE(excluded.instructions, sessions.instructions)
+"""
+
+
+def _ts_bound(a: datetime | None, b: datetime | None, pick: Any) -> datetime | None:
+    # min/max that skips None, like SQL LEAST/GREATEST.
+    if a is None:
+        return b
+    if b is None:
+        return a
+    try:
+        return pick(a, b)
+    except TypeError:
+        # Naive vs aware timestamps; keep what we had.
+        return a
+
+
+_SESSION_FILES_SELECT = (
+    "SELECT path, size, mtime_epoch, mtime_ns, last_offset, last_line_no, session_id FROM session_files"
+)
+_SESSION_FILES_TOUCH = "UPDATE session_files SET last_seen_at = ? WHERE list_contains(?, path)"
+_SESSION_FILE_COLUMNS = (
+    "path",
+    "session_id",
+    "size",
+    "mtime",
+    "mtime_epoch",
+    "mtime_ns",
+    "last_offset",
+    "last_line_no",
+    "last_seen_at",
+)
+_SESSION_FILE_UPSERT = """
+ON CONFLICT(path) DO UPDATE SET
+  session_id = COALESCE(excluded.session_id, session_files.session_id),
+  size = excluded.size,
+  mtime = excluded.mtime,
+  mtime_epoch = excluded.mtime_epoch,
+  mtime_ns = excluded.mtime_ns,
+  last_offset = excluded.last_offset,
+  last_line_no = excluded.last_line_no,
+  last_seen_at = excluded.last_seen_at
+"""
+
+
+def _collect_session(
+    pending: dict[str, list[Any]], meta: dict[str, Any], event_ts_str: str | None
+) -> int:
+    """
+    Merge a session_meta payload into `pending` (one row per session id, ordered as
+    _SESSION_COLUMNS) the same way the upsert merges it into `sessions`.
+    """
     session_id = meta.get("id")
     if not isinstance(session_id, str) or not session_id:
         return 0
 
     ts = parse_ts(meta.get("timestamp")) or parse_ts(event_ts_str)
-    cwd = meta.get("cwd")
-    originator = meta.get("originator")
-    cli_version = meta.get("cli_version")
-    source = meta.get("source")
-    model_provider = meta.get("model_provider")
-    instructions = meta.get("instructions")
-
-    # Insert or update, and also keep first_ts/last_ts conservative.
-    con.execute(
-        """
-        INSERT INTO sessions(
-          session_id, first_ts, last_ts, cwd, originator, cli_version, source, model_provider, instructions
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ON CONFLICT(session_id) DO UPDATE SET
-          first_ts = LEAST(COALESCE(sessions.first_ts, excluded.first_ts), excluded.first_ts),
-          last_ts = GREATEST(COALESCE(sessions.last_ts, excluded.last_ts), excluded.last_ts),
-          cwd = COALESCE(excluded.cwd, sessions.cwd),
-          originator = COALESCE(excluded.originator, sessions.originator),
-          cli_version = COALESCE(excluded.cli_version, sessions.cli_version),
-          source = COALESCE(excluded.source, sessions.source),
-          model_provider = COALESCE(excluded.model_provider, sessions.model_provider),
-          instructions = COALESCE(excluded.instructions, sessions.instructions)
-        """,
-        [
-            session_id,
-            ts,
-            ts,
-            cwd if isinstance(cwd, str) else None,
-            originator if isinstance(originator, str) else None,
-            cli_version if isinstance(cli_version, str) else None,
-            source if isinstance(source, str) else None,
-            model_provider if isinstance(model_provider, str) else None,
-            instructions if isinstance(instructions, str) else None,
-        ],
-    )
+    fields = [v if isinstance(v := meta.get(k), str) else None for k in _SESSION_TEXT_FIELDS]
+    _merge_session_row(pending, [session_id, ts, ts, *fields])
     return 1
 
 
-def _insert_docs(con: Any, docs: Iterable[ExtractedDoc]) -> int:
-    n = 0
-    for d in docs:
-        con.execute(
-            """
-            INSERT OR IGNORE INTO docs(
-              doc_id, session_id, file_path, line_no, event_ts, event_type, inner_type, role, kind, text, text_len
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """,
-            [
-                d.doc_id,
-                d.session_id,
-                d.file_path,
-                d.line_no,
-                d.event_ts,
-                d.event_type,
-                d.inner_type,
-                d.role,
-                d.kind,
-                d.text,
-                len(d.text),
-            ],
-        )
-        n += 1
-    return n
+def _merge_session_row(pending: dict[str, list[Any]], row: list[Any]) -> None:
+    prev = pending.get(row[0])
+    if prev is None:
+        pending[row[0]] = row
+        return
+    prev[1] = _ts_bound(prev[1], row[1], min)
+    prev[2] = _ts_bound(prev[2], row[2], max)
+    for i in range(3, len(row)):
+        if row[i] is not None:
+            prev[i] = row[i]
+
+
+def _upsert_sessions(con: Any, pending: dict[str, list[Any]]) -> None:
+    # Rows are unique per session_id, so a single multi-row upsert never hits the same row twice.
+    dbmod.insert_rows(
+        con, "sessions", _SESSION_COLUMNS, map(tuple, pending.values()), on_conflict=_SESSION_UPSERT
+    )
+
+
+# ExtractedDoc attributes in DOC_COLUMNS order (text_len is derived from text).
+_DOC_ATTRS = tuple(attrgetter(c) for c in dbmod.DOC_COLUMNS[:-1])
+
 
+def _doc_columns(docs: list[ExtractedDoc]) -> list[list[Any]]:
+    # Build the batch column by column: one C-level attribute map per column is much cheaper
+    # than a Python tuple per doc that the Arrow conversion then has to transpose.
+    columns = [list(map(get, docs)) for get in _DOC_ATTRS]
+    columns.append(list(map(len, columns[-1])))
+    return columns
+
+
+_SESSION_ID_COL = dbmod.DOC_COLUMNS.index("session_id")
+
+
+def _insert_docs(
+    con: Any, columns: list[list[Any]], touched_sessions: set[str], seen_ids: set[int] | None
+) -> int:
+    """
+    Insert a batch of doc columns. `seen_ids` is given when docs was empty at the start of the
+    refresh: every doc_id inserted so far is then in it, so duplicates are dropped here and the
+    insert can skip the OR IGNORE conflict check.
+    """
+    touched_sessions.update(filter(None, columns[_SESSION_ID_COL]))
+    if seen_ids is None:
+        return dbmod.bulk_insert_doc_columns(con, columns)
+    return dbmod.bulk_insert_doc_columns(con, _drop_seen_docs(columns, seen_ids), or_ignore=False)
+
+
+def _drop_seen_docs(columns: list[list[Any]], seen_ids: set[int]) -> list[list[Any]]:
+    ids = columns[0]
+    batch_ids = set(ids)
+    if len(batch_ids) == len(ids) and seen_ids.isdisjoint(batch_ids):
+        seen_ids |= batch_ids
+        return columns
+    # A repeated doc_id (hash collision): keep the first, as INSERT OR IGNORE would.
+    keep = []
+    for i, doc_id in enumerate(ids):
+        if doc_id not in seen_ids:
+            seen_ids.add(doc_id)
+            keep.append(i)
+    return [[col[i] for i in keep] for col in columns]
+
+
+@dataclass
+class _ParsedFile:
+    # Everything refresh needs from one session file's new lines.
+    doc_columns: list[list[Any]]
+    sessions: dict[str, list[Any]]
+    session_events: int
+    session_id: str | None
+    offset: int
+    line_no: int
+    lines_read: int
+    lines_ingested: int
+
+
+def _parse_file(
+    file_path: str,
+    offset: int,
+    line_no: int,
+    session_id: str | None,
+    include_assistant: bool,
+    include_internal: bool,
+) -> _ParsedFile:
+    """
+    Parse the lines of `file_path` after byte `offset` (line `line_no`). Touches no database
+    state, so files can be parsed in worker processes.
+    """
+    docs: list[ExtractedDoc] = []
+    sessions: dict[str, list[Any]] = {}
+    session_events = 0
+    lines_read = 0
+    lines_ingested = 0
+    last_good_offset = offset
+    last_good_line_no = line_no
+
+    # Binary read so we can maintain byte offsets precisely.
+    with open(file_path, "rb") as f:
+        if offset > 0:
+            f.seek(offset)
+        # Iterating the buffered file splits lines in C; offsets are tracked by
+        # arithmetic instead of a tell() per line. The last line may lack its newline.
+        for bline in f:
+            lines_read += 1
+
+            # Always advance line number for each newline-delimited record we see.
+            line_no += 1
+            offset += len(bline)
+
+            # Parse the raw bytes directly (orjson decodes UTF-8 and skips the trailing
+            # newline itself). Blank lines and invalid UTF-8 are rare, so they are only
+            # sorted out once the fast parse has failed.
+            try:
+                event = json_loads(bline)
+            except ValueError:
+                if bline.isspace():
+                    last_good_offset = offset
+                    last_good_line_no = line_no
+                    continue
+                try:
+                    event = json.loads(bline.decode("utf-8", errors="replace"))
+                except ValueError:
+                    # Likely partial write; stop and do not advance beyond last good JSON.
+                    break
+
+            if not isinstance(event, dict):
+                last_good_offset = offset
+                last_good_line_no = line_no
+                continue
+
+            lines_ingested += 1
+
+            meta = extract_session_meta(event)
+            if meta is not None:
+                session_events += _collect_session(sessions, meta, event.get("timestamp"))
+                sid = meta.get("id")
+                if isinstance(sid, str) and sid:
+                    session_id = sid
+
+            extracted = extract_docs_from_event(
+                event=event,
+                file_path=file_path,
+                line_no=line_no,
+                session_id_hint=session_id,
+                include_assistant=include_assistant,
+                include_internal=include_internal,
+            )
+            if extracted:
+                docs.extend(extracted)
+
+            last_good_offset = offset
+            last_good_line_no = line_no
+
+    return _ParsedFile(
+        doc_columns=_doc_columns(docs),
+        sessions=sessions,
+        session_events=session_events,
+        session_id=session_id,
+        offset=last_good_offset,
+        line_no=last_good_line_no,
+        lines_read=lines_read,
+        lines_ingested=lines_ingested,
+    )
 
-def _open_for_incremental(path: Path) -> tuple[object, int, float]:
-    st = path.stat()
-    # `mtime` from stat is float seconds; DuckDB TIMESTAMP accepts python datetime.
-    return st, int(st.st_size), float(st.st_mtime)
+
+# Parse changed files in worker processes once there are at least this many of them (a full
+# refresh, or a first run over a large sessions dir). Below that, process startup costs more
+# than it saves.
+PARALLEL_MIN_FILES = 16
+MAX_PARSE_WORKERS = 8
+# Parsed-but-not-yet-written files allowed per worker (see _parse_files).
+PARSE_WINDOW_PER_WORKER = 2
+
+
+def _parse_workers(n_files: int) -> int:
+    # 0 means parse in this process.
+    if n_files < PARALLEL_MIN_FILES:
+        return 0
+    workers = min(os.cpu_count() or 1, n_files, MAX_PARSE_WORKERS)
+    return workers if workers > 1 else 0
+
+
+def _parse_files(
+    jobs: list[tuple[str, int, int, str | None]],
+    include_assistant: bool,
+    include_internal: bool,
+    *,
+    parallel: bool = False,
+) -> Iterator[_ParsedFile]:
+    """
+    Yield a _ParsedFile per (file_path, offset, line_no, session_id) job, in job order. With
+    `parallel`, large batches are parsed in worker processes (see `refresh`).
+    """
+    parse = partial(
+        _parse_file_job, include_assistant=include_assistant, include_internal=include_internal
+    )
+    workers = _parse_workers(len(jobs)) if parallel else 0
+    if not workers:
+        yield from map(parse, jobs)
+        return
+    done = 0
+    try:
+        for res in _parse_in_pool(parse, jobs, workers):
+            yield res
+            done += 1
+    except BrokenProcessPool:
+        # Workers failed to start or died, e.g. because the caller's __main__ can't be
+        # re-imported under spawn. Results come back in order, so parse the rest here.
+        yield from map(parse, jobs[done:])
+
+
+def _parse_in_pool(
+    parse: Callable[[tuple[str, int, int, str | None]], _ParsedFile],
+    jobs: list[tuple[str, int, int, str | None]],
+    workers: int,
+) -> Iterator[_ParsedFile]:
+    # "spawn" rather than fork: this process holds an open DuckDB connection and its threads.
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+        # A sliding window of submitted files rather than pool.map, which submits every job up
+        # front and holds each parsed file until the caller reaches it: with at most
+        # PARSE_WINDOW_PER_WORKER files per worker in flight, memory stays bounded by the
+        # window plus the DOC_BATCH_SIZE buffer on a full re-ingest.
+        window: deque[Future[_ParsedFile]] = deque()
+        for job in jobs:
+            window.append(pool.submit(parse, job))
+            if len(window) >= workers * PARSE_WINDOW_PER_WORKER:
+                yield window.popleft().result()
+        while window:
+            yield window.popleft().result()
+
+
+def _parse_file_job(
+    job: tuple[str, int, int, str | None], *, include_assistant: bool, include_internal: bool
+) -> _ParsedFile:
+    return _parse_file(*job, include_assistant, include_internal)
 
 
 def refresh(
@@ -121,9 +391,46 @@ def refresh(
     include_assistant_in_ingest: bool = True,
     include_internal_in_ingest: bool = True,
     verbose: bool = False,
+    parallel: bool = False,
 ) -> RefreshStats:
+    """
+    Ingest new and changed session files from `sessions_dir` into the database in `data_dir`.
+
+    `parallel=True` parses large batches of changed files (a first run, `full`) in worker
+    processes started with "spawn", which re-imports the caller's `__main__` module. Only pass
+    it from a program whose entry point is guarded by `if __name__ == "__main__":`, as the CLI
+    is; if the workers can't start, parsing falls back to this process.
+    """
     data_dir.mkdir(parents=True, exist_ok=True)
-    con = dbmod.connect(db_path(data_dir))
+    db_file = db_path(data_dir)
+    con = dbmod.open_with_backoff(lambda: dbmod.connect(db_file))
+    try:
+        return _refresh(
+            con,
+            sessions_dir=sessions_dir,
+            full=full,
+            reindex=reindex,
+            include_assistant_in_ingest=include_assistant_in_ingest,
+            include_internal_in_ingest=include_internal_in_ingest,
+            verbose=verbose,
+            parallel=parallel,
+        )
+    finally:
+        # Release the write lock right away so a following read-only open doesn't have to wait.
+        con.close()
+
+
+def _refresh(
+    con: Any,
+    *,
+    sessions_dir: Path,
+    full: bool,
+    reindex: bool,
+    include_assistant_in_ingest: bool,
+    include_internal_in_ingest: bool,
+    verbose: bool,
+    parallel: bool,
+) -> RefreshStats:
     dbmod.ensure_schema(con)
 
     stats = RefreshStats()
@@ -131,174 +438,148 @@ def refresh(
     if full:
         # Start fresh.
         con.execute("DELETE FROM docs")
+        con.execute("DELETE FROM docs_text")
+        con.execute("DELETE FROM fts_pending")
         con.execute("DELETE FROM sessions")
         con.execute("DELETE FROM session_files")
+        con.execute("DELETE FROM session_counts")
         dbmod.set_setting(con, "fts_available", "0")
         dbmod.set_setting(con, "fts_index_ready", "0")
 
     fts_ok = dbmod.try_enable_fts(con)
     stats.fts_available = fts_ok
 
-    paths = _iter_jsonl_paths(sessions_dir)
-    stats.files_scanned = len(paths)
+    files = _iter_jsonl_files(sessions_dir)
+    stats.files_scanned = len(files)
+
+    # Sessions whose docs changed; their session_counts rows are recomputed before commit.
+    touched_sessions: set[str] = set()
+    # Truncated files drop their docs, which the incremental FTS update can't handle.
+    docs_removed = False
+    # session_meta rows collapsed per session id, upserted once after all files are read.
+    pending_sessions: dict[str, list[Any]] = {}
+    # Pending doc columns from every file processed so far (see DOC_BATCH_SIZE).
+    docs_to_insert: list[list[Any]] = [[] for _ in dbmod.DOC_COLUMNS]
+    # First run or --full: nothing to conflict with in the table, so track doc_ids here instead.
+    seen_ids: set[int] | None = None
+    if con.execute("SELECT NOT EXISTS (SELECT 1 FROM docs)").fetchone()[0]:
+        seen_ids = set()
 
     # Use a transaction for speed and consistency.
     con.execute("BEGIN TRANSACTION")
     try:
-        for p in paths:
+        # First pass: decide what to read from each file (and handle truncation). Known
+        # files are compared in Python against one snapshot of session_files.
+        known_files = {r[0]: r[1:] for r in con.execute(_SESSION_FILES_SELECT).fetchall()}
+        unchanged_paths: list[str] = []
+        jobs: list[tuple[str, int, int, str | None]] = []
+        file_stats: list[tuple[int, datetime, float, int]] = []
+        for p, st in files:
             file_path = str(p)
-            st = p.stat()
             size = int(st.st_size)
             # Store local/naive timestamp for display and store epoch seconds for stable comparisons.
             mtime_dt = datetime.fromtimestamp(st.st_mtime)
             mtime_epoch = float(st.st_mtime)
+            mtime_ns = int(st.st_mtime_ns)
 
-            row = con.execute(
-                "SELECT size, mtime_epoch, mtime, last_offset, last_line_no, session_id FROM session_files WHERE path = ?",
-                [file_path],
-            ).fetchone()
+            row = known_files.get(file_path)
 
             last_offset = 0
             last_line_no = 0
             known_session_id: str | None = None
             if row:
-                prev_size, prev_mtime_epoch, prev_mtime, last_offset, last_line_no, known_session_id = row
+                prev_size, prev_mtime_epoch, prev_mtime_ns, last_offset, last_line_no, known_session_id = row
                 # Truncation: reset and delete docs for the file.
                 if size < int(last_offset):
                     if verbose:
                         pass
-                    _delete_file_docs(con, file_path)
+                    touched_sessions |= _delete_file_docs(con, file_path)
+                    docs_removed = True
                     last_offset = 0
                     last_line_no = 0
 
-                # No change: skip.
+                # No change: skip. Rows written before mtime_ns existed fall back to the
+                # float comparison.
                 same_size = size == int(prev_size)
                 same_mtime = False
-                if prev_mtime_epoch is not None:
+                if prev_mtime_ns is not None:
+                    same_mtime = prev_mtime_ns == mtime_ns
+                elif prev_mtime_epoch is not None:
                     try:
                         same_mtime = abs(float(prev_mtime_epoch) - mtime_epoch) < 0.0005
                     except Exception:
                         same_mtime = False
                 if same_size and same_mtime:
-                    con.execute(
-                        """
-                        UPDATE session_files
-                        SET last_seen_at = ?
-                        WHERE path = ?
-                        """,
-                        [utcnow(), file_path],
-                    )
+                    unchanged_paths.append(file_path)
                     continue
 
             # Ingest appended lines.
             stats.files_updated += 1
+            jobs.append((file_path, int(last_offset), int(last_line_no), known_session_id))
+            file_stats.append((size, mtime_dt, mtime_epoch, mtime_ns))
 
-            docs_to_insert: list[ExtractedDoc] = []
-            sessions_upsert = 0
-            new_session_id: str | None = known_session_id
-
-            # Binary read so we can maintain byte offsets precisely.
-            offset = int(last_offset)
-            line_no = int(last_line_no)
-            last_good_offset = offset
-            last_good_line_no = line_no
-
-            with p.open("rb") as f:
-                if offset > 0:
-                    f.seek(offset)
-                while True:
-                    bline = f.readline()
-                    if not bline:
-                        break
-                    stats.lines_read += 1
-                    try:
-                        line = bline.decode("utf-8", errors="replace").strip()
-                    except Exception:
-                        # Bail on decode errors, keep offset at last good line.
-                        break
-
-                    # Always advance line number for each newline-delimited record we see.
-                    line_no += 1
-                    offset = f.tell()
-
-                    if not line:
-                        last_good_offset = offset
-                        last_good_line_no = line_no
-                        continue
-
-                    try:
-                        event = json.loads(line)
-                    except Exception:
-                        # Likely partial write; stop and do not advance beyond last good JSON.
-                        break
-
-                    if not isinstance(event, dict):
-                        last_good_offset = offset
-                        last_good_line_no = line_no
-                        continue
-
-                    stats.lines_ingested += 1
-
-                    meta = extract_session_meta(event)
-                    if meta is not None:
-                        sessions_upsert += _upsert_session(con, meta, event.get("timestamp"))
-                        sid = meta.get("id")
-                        if isinstance(sid, str) and sid:
-                            new_session_id = sid
-
-                    extracted = extract_docs_from_event(
-                        event=event,
-                        file_path=file_path,
-                        line_no=line_no,
-                        session_id_hint=new_session_id,
-                        include_assistant=include_assistant_in_ingest,
-                        include_internal=include_internal_in_ingest,
-                    )
-                    if extracted:
-                        docs_to_insert.extend(extracted)
-
-                    last_good_offset = offset
-                    last_good_line_no = line_no
-
-            if docs_to_insert:
-                stats.docs_inserted += _insert_docs(con, docs_to_insert)
-
-            stats.sessions_upserted += sessions_upsert
-
-            con.execute(
-                """
-                INSERT INTO session_files(path, session_id, size, mtime, mtime_epoch, last_offset, last_line_no, last_seen_at)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                ON CONFLICT(path) DO UPDATE SET
-                  session_id = COALESCE(excluded.session_id, session_files.session_id),
-                  size = excluded.size,
-                  mtime = excluded.mtime,
-                  mtime_epoch = excluded.mtime_epoch,
-                  last_offset = excluded.last_offset,
-                  last_line_no = excluded.last_line_no,
-                  last_seen_at = excluded.last_seen_at
-                """,
-                [
+        # Second pass: parse (possibly in parallel) and write results in file order.
+        session_file_rows: list[tuple[Any, ...]] = []
+        parsed = _parse_files(
+            jobs, include_assistant_in_ingest, include_internal_in_ingest, parallel=parallel
+        )
+        for (file_path, *_), (size, mtime_dt, mtime_epoch, mtime_ns), res in zip(jobs, file_stats, parsed):
+            stats.lines_read += res.lines_read
+            stats.lines_ingested += res.lines_ingested
+            stats.sessions_upserted += res.session_events
+            for row in res.sessions.values():
+                _merge_session_row(pending_sessions, row)
+
+            for buf, col in zip(docs_to_insert, res.doc_columns):
+                buf.extend(col)
+            if len(docs_to_insert[0]) >= DOC_BATCH_SIZE:
+                stats.docs_inserted += _insert_docs(con, docs_to_insert, touched_sessions, seen_ids)
+                docs_to_insert = [[] for _ in dbmod.DOC_COLUMNS]
+
+            session_file_rows.append(
+                (
                     file_path,
-                    new_session_id,
+                    res.session_id,
                     size,
                     mtime_dt,
                     mtime_epoch,
-                    last_good_offset,
-                    last_good_line_no,
+                    mtime_ns,
+                    res.offset,
+                    res.line_no,
                     utcnow(),
-                ],
+                )
             )
 
+        if docs_to_insert[0]:
+            stats.docs_inserted += _insert_docs(con, docs_to_insert, touched_sessions, seen_ids)
+        if pending_sessions:
+            _upsert_sessions(con, pending_sessions)
+        dbmod.insert_rows(
+            con,
+            "session_files",
+            _SESSION_FILE_COLUMNS,
+            session_file_rows,
+            on_conflict=_SESSION_FILE_UPSERT,
+        )
+        if unchanged_paths:
+            con.execute(_SESSION_FILES_TOUCH, [utcnow(), unchanged_paths])
+
+        # Starting from an empty docs table every session is touched: recompute them all.
+        dbmod.refresh_session_counts(con, None if seen_ids is not None else touched_sessions)
+        if docs_removed:
+            # Appending can't drop index entries (and skips doc_ids already indexed), so
+            # record with the deletion that only a full rebuild brings FTS back in sync.
+            dbmod.set_setting(con, "fts_index_ready", "0")
+
         con.execute("COMMIT")
     except Exception:
         con.execute("ROLLBACK")
         raise
 
-    # Rebuild FTS if enabled and requested.
-    if reindex and stats.docs_inserted > 0 and stats.fts_available:
+    # Update FTS if enabled and requested; once per refresh, after all batches are in.
+    if reindex and (stats.docs_inserted > 0 or docs_removed) and stats.fts_available:
         try:
-            dbmod.rebuild_fts_index(con)
+            dbmod.update_fts_index(con, full=full or docs_removed)
             stats.fts_reindexed = True
         except Exception:
             stats.fts_reindexed = False
@@ -1,7 +1,8 @@
 from __future__ import annotations
 
-import json
 import re
+from datetime import datetime
+from functools import lru_cache
 from typing import Iterable
 
 from rich.console import Console
@@ -9,6 +10,7 @@ from rich.table import Table
 from rich.text import Text
 
 from .search import SearchResult
+from .util import json_dumps_pretty
 
 
 OUTPUT_FORMATS = ("table", "text", "json", "markdown")
@@ -21,6 +23,12 @@ def _short_id(value: str | None, n: int = 8) -> str:
     return s if len(s) <= n else s[:n]
 
 
+def _fmt_ts(value: datetime | str | None) -> str:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value or "-"
+
+
 def build_console(color: str) -> Console:
     c = color.lower()
     if c == "always":
@@ -30,10 +38,12 @@ def build_console(color: str) -> Console:
     return Console()
 
 
-def _normalize_needles(query: str) -> list[str]:
+@lru_cache(maxsize=64)
+def _normalize_needles(query: str) -> tuple[str, ...]:
+    # Cached: rendering calls this once per result row with the same query.
     q = query.strip()
     if not q:
-        return []
+        return ()
     # Treat typical input as a substring, but highlight individual terms too.
     parts = [p for p in re.split(r"\s+", q) if p]
     needles: list[str] = []
@@ -57,7 +67,7 @@ def _normalize_needles(query: str) -> list[str]:
         out.append(n)
         if len(out) >= 8:
             break
-    return out
+    return tuple(out)
 
 
 def find_match_spans(haystack: str, needles: Iterable[str], *, case_insensitive: bool = True) -> list[tuple[int, int]]:
@@ -65,23 +75,22 @@ def find_match_spans(haystack: str, needles: Iterable[str], *, case_insensitive:
     if not text:
         return []
 
+    # Lower the haystack once rather than once per needle.
+    if case_insensitive:
+        h = text.lower()
+        lneedles = [n.lower() for n in needles if n]
+    else:
+        h = text
+        lneedles = [n for n in needles if n]
+
     spans: list[tuple[int, int]] = []
-    for needle in needles:
-        if not needle:
-            continue
-        if case_insensitive:
-            h = text.lower()
-            n = needle.lower()
-        else:
-            h = text
-            n = needle
-        start = 0
-        while True:
-            idx = h.find(n, start)
-            if idx < 0:
-                break
-            spans.append((idx, idx + len(needle)))
-            start = idx + max(1, len(needle))
+    find = h.find
+    for n in lneedles:
+        size = len(n)
+        idx = find(n)
+        while idx >= 0:
+            spans.append((idx, idx + size))
+            idx = find(n, idx + size)
 
     if not spans:
         return []
@@ -99,8 +108,12 @@ def find_match_spans(haystack: str, needles: Iterable[str], *, case_insensitive:
     return merged
 
 
-def highlight_snippet_rich(snippet: str, query: str) -> Text:
-    needles = _normalize_needles(query)
+def highlight_snippet_rich(
+    snippet: str, query: str, *, needles: tuple[str, ...] | None = None
+) -> Text:
+    # `needles`: `_normalize_needles(query)`, when the caller already has it.
+    if needles is None:
+        needles = _normalize_needles(query)
     spans = find_match_spans(snippet, needles, case_insensitive=True)
     t = Text(snippet)
     # High contrast that reads well on most terminals.
@@ -109,16 +122,23 @@ def highlight_snippet_rich(snippet: str, query: str) -> Text:
     return t
 
 
-def highlight_snippet_markdown(snippet: str, query: str) -> str:
-    needles = _normalize_needles(query)
+def highlight_snippet_markdown(
+    snippet: str, query: str, *, needles: tuple[str, ...] | None = None
+) -> str:
+    if needles is None:
+        needles = _normalize_needles(query)
     spans = find_match_spans(snippet, needles, case_insensitive=True)
     if not spans:
         return snippet
-    s = snippet
-    # Insert from end to start to keep indexes stable.
-    for a, b in reversed(spans):
-        s = s[:a] + "**" + s[a:b] + "**" + s[b:]
-    return s
+    # Assemble the pieces in one join instead of re-slicing the whole string per span.
+    parts = []
+    prev = 0
+    for a, b in spans:
+        parts.append(snippet[prev:a])
+        parts.append("**" + snippet[a:b] + "**")
+        prev = b
+    parts.append(snippet[prev:])
+    return "".join(parts)
 
 
 def render_search_results(
@@ -132,6 +152,8 @@ def render_search_results(
     fmt = output_format.lower()
     if fmt not in OUTPUT_FORMATS:
         raise ValueError(f"unknown format: {output_format}")
+    # Same query for every row: split it into highlight needles once.
+    needles = _normalize_needles(query)
 
     if fmt == "json":
         payload = []
@@ -139,7 +161,8 @@ def render_search_results(
             item = {
                 "doc_id": r.doc_id,
                 "session_id": r.session_id,
-                "event_ts": r.event_ts.isoformat() if r.event_ts else None,
+                # Serialized natively by orjson (or via the stdlib fallback's default hook).
+                "event_ts": r.event_ts,
                 "role": r.role,
                 "kind": r.kind,
                 "file_path": r.file_path,
@@ -153,7 +176,7 @@ def render_search_results(
             if r.match_pos is not None:
                 item["match_pos"] = r.match_pos
             payload.append(item)
-        return json.dumps({"mode": mode, "results": payload}, ensure_ascii=True, indent=2, sort_keys=True)
+        return json_dumps_pretty({"mode": mode, "results": payload})
 
     if fmt == "markdown":
         # Keep it clean and portable; no ANSI. Use bold for highlights.
@@ -165,7 +188,7 @@ def render_search_results(
             score = f"{r.score:.3f}" if r.score is not None else "-"
             sid = r.session_id or "-"
             role = r.role or "-"
-            snippet = highlight_snippet_markdown(r.snippet, query)
+            snippet = highlight_snippet_markdown(r.snippet, query, needles=needles)
             snippet = snippet.replace("\n", "<br>").replace("|", "\\|")
             lines.append(f"| {ts} | {score} | `{sid}` | `{role}` | {snippet} |")
         return "\n".join(lines)
@@ -189,7 +212,7 @@ def render_search_results(
             score = f"{r.score:.3f}" if r.score is not None else "-"
             sid = _short_id(r.session_id, 8)
             role = r.role or "-"
-            table.add_row(ts, score, sid, role, highlight_snippet_rich(r.snippet, query))
+            table.add_row(ts, score, sid, role, highlight_snippet_rich(r.snippet, query, needles=needles))
 
         console.print(table)
         return None
@@ -203,7 +226,7 @@ def render_search_results(
         role = r.role or "-"
         score = f"{r.score:.3f}" if r.score is not None else "-"
         prefix = Text(f"{ts}  {score}  {sid}  {role}  ", style="dim")
-        console.print(prefix + highlight_snippet_rich(r.snippet, query))
+        console.print(prefix + highlight_snippet_rich(r.snippet, query, needles=needles))
     return None
 
 
@@ -218,14 +241,14 @@ def render_sessions(
         raise ValueError(f"unknown format: {output_format}")
 
     if fmt == "json":
-        return json.dumps(rows, ensure_ascii=True, indent=2, sort_keys=True)
+        return json_dumps_pretty(rows)
 
     if fmt == "markdown":
         lines = []
         lines.append("| last_ts | session_id | user | assistant | internal | cwd |")
         lines.append("|---:|---|---:|---:|---:|---|")
         for r in rows:
-            last_ts = r.get("last_ts") or "-"
+            last_ts = _fmt_ts(r.get("last_ts"))
             sid = r.get("session_id") or "-"
             cwd = (r.get("cwd") or "-").replace("|", "\\|")
             lines.append(
@@ -244,7 +267,7 @@ def render_sessions(
 
     for r in rows:
         table.add_row(
-            r.get("last_ts") or "-",
+            _fmt_ts(r.get("last_ts")),
             _short_id(r.get("session_id"), 8),
             str(r.get("user_docs", 0)),
             str(r.get("assistant_docs", 0)),
@@ -259,7 +282,7 @@ def render_sessions(
     # text: print one per line with mild color
     for r in rows:
         console.print(
-            Text(r.get("last_ts") or "-", style="dim")
+            Text(_fmt_ts(r.get("last_ts")), style="dim")
             + Text("  ")
             + Text(r.get("session_id") or "-", style="cyan")
             + Text(
@@ -1,14 +1,18 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
+import weakref
+from collections import OrderedDict
 from datetime import datetime
-from typing import Any
+from itertools import product
+from typing import Any, Callable, NamedTuple
 
-from .db import get_setting, is_fts_available, try_enable_fts
+from .db import fts_state, is_pooled_read_only, try_enable_fts
 
 
-@dataclass(frozen=True)
-class SearchResult:
+class SearchResult(NamedTuple):
+    # A NamedTuple rather than a frozen dataclass: immutable all the same, but built by the C
+    # tuple constructor instead of one object.__setattr__ per field. Replace fields with
+    # `_replace`.
     doc_id: str
     session_id: str | None
     event_ts: datetime | None
@@ -22,7 +26,19 @@ class SearchResult:
     text: str | None
 
 
-def _make_snippet(text: str, query: str, max_len: int = 180) -> str:
+def _is_collapsed(text: str) -> bool:
+    # Same as `" ".join(text.split()) == text`: every whitespace char str.split() knows other
+    # than " " is non-printable, so only doubled and leading/trailing spaces remain to rule out.
+    return text.isprintable() and "  " not in text and text[:1] != " " and text[-1:] != " "
+
+
+def _make_snippet(
+    text: str, query: str, max_len: int = 180, *, needles: list[str] | None = None
+) -> str:
+    # `needles`: `_snippet_needles(query.strip())`, when the caller already has it.
+    if len(text) <= max_len and _is_collapsed(text):
+        # Common case (short one-line prompts): nothing to collapse or cut.
+        return text
     t = " ".join(text.split())
     if len(t) <= max_len:
         return t
@@ -30,12 +46,14 @@ def _make_snippet(text: str, query: str, max_len: int = 180) -> str:
     if not q_raw:
         return t[: max_len - 1] + "…"
 
-    # Prefer centering on any matching token, but keep substring UX by checking the full query too.
-    needles = [q_raw] + [p for p in q_raw.split() if len(p) >= 2]
     h = t.lower()
+    if len(h) != len(t):
+        # A few characters lower to more than one ("İ" -> "i̇"); keep them as is so offsets in h
+        # are offsets in t.
+        h = "".join(lc if len(lc := c.lower()) == 1 else c for c in t)
     idx = -1
-    for n in needles:
-        j = h.find(n.lower())
+    for n in _snippet_needles(q_raw) if needles is None else needles:
+        j = h.find(n)
         if j >= 0 and (idx < 0 or j < idx):
             idx = j
     if idx < 0:
@@ -47,7 +65,84 @@ def _make_snippet(text: str, query: str, max_len: int = 180) -> str:
         s = "…" + s
     if end < len(t):
         s = s + "…"
-    return s
+    return _clamp_snippet(s, max_len)
+
+
+def _clamp_snippet(s: str, max_len: int) -> str:
+    # Ellipses count towards max_len. Cut from the end: the match sits in the first third.
+    return s if len(s) <= max_len else s[: max_len - 1] + "…"
+
+
+def _snippet_needles(q: str) -> list[str]:
+    # Prefer centering on any matching token, but keep substring UX by checking the full query too.
+    return [n.lower() for n in [q] + [p for p in q.split() if len(p) >= 2]]
+
+
+# Without include_text, search fetches only an excerpt of each doc: from _EXCERPT_BEFORE chars
+# before the earliest needle match, _EXCERPT_WIDTH chars long. That is generous next to the
+# 180-char snippet, so whitespace collapsing in _make_snippet still has enough text either side.
+# Positions are found in text_lower, which indexes `text` as long as it is as many characters
+# long. A few characters ("İ") grow when Python lowers them; for those rare docs DuckDB's
+# lower(text), which maps one character to one, is searched instead.
+_EXCERPT_BEFORE = 300
+_EXCERPT_WIDTH = 1000
+_EXCERPT_SQL = f"""
+          greatest(1, coalesce(list_min(list_filter(
+            list_transform(?::VARCHAR[], lambda n: instr(
+              CASE WHEN length(t.text_lower) = t.text_len THEN t.text_lower ELSE lower(t.text) END, n
+            )),
+            lambda p: p > 0
+          )), 1) - {_EXCERPT_BEFORE}) AS win_start,
+          substring(t.text, win_start, {_EXCERPT_WIDTH}) AS text,
+          t.text_len"""
+_FULL_TEXT_SQL = """
+          1 AS win_start,
+          t.text,
+          t.text_len"""
+
+
+# BM25 over the FTS index tables, as `match_bm25` computes it (k=1.2, b=0.75, any term), but
+# driven from the query's terms: only docs containing one of them are scored. Calling the
+# macro per row instead makes every doc a candidate. The tables are the same ones
+# `update_fts_index` appends to.
+_FTS_SCORES_CTES = """
+        tokens AS (
+          SELECT DISTINCT stem(unnest(fts_main_docs_text.tokenize(?)), 'porter') AS t
+        ),
+        qterms AS (
+          SELECT dict.termid, dict.df
+          FROM fts_main_docs_text.dict AS dict
+          JOIN tokens ON dict.term = tokens.t
+        ),
+        term_tf AS (
+          SELECT docid, termid, count(*) AS tf
+          FROM fts_main_docs_text.terms
+          WHERE termid IN (SELECT termid FROM qterms)
+          GROUP BY docid, termid
+        ),
+        scores AS (
+          SELECT fd.name AS doc_id, sum(
+            log((((st.num_docs - q.df) + 0.5) / (q.df + 0.5)) + 1)
+            * ((tf * (1.2 + 1)) / (tf + (1.2 * ((1 - 0.75) + (0.75 * (fd.len / st.avgdl))))))
+          ) AS score
+          FROM term_tf
+          JOIN qterms AS q USING (termid)
+          JOIN fts_main_docs_text.docs AS fd ON fd.docid = term_tf.docid
+          CROSS JOIN fts_main_docs_text.stats AS st
+          GROUP BY fd.name
+        )"""
+
+
+def _excerpt_snippet(
+    text: str, win_start: int, text_len: int, query: str, needles: list[str], max_len: int = 180
+) -> str:
+    # `text` is text_len chars of the doc starting at (1-based) win_start; mark what was cut.
+    s = _make_snippet(text, query, max_len, needles=needles)
+    if win_start > 1 and not s.startswith("…"):
+        s = "…" + s
+    if win_start - 1 + len(text) < text_len and not s.endswith("…"):
+        s = s + "…"
+    return _clamp_snippet(s, max_len)
 
 
 def _normalize_needles(query: str) -> list[str]:
@@ -102,6 +197,114 @@ def extract_context_lines(text: str, query: str, n: int) -> str:
     return "\n".join(lines[start:end])
 
 
+_ROLE_CLAUSES = {
+    False: "role = 'user'",
+    True: "(role = 'user' OR role = 'assistant' OR role IS NULL)",
+}
+_KIND_CLAUSES = {
+    False: "(kind IN ('message_content','message_summary'))",
+    True: "(1=1)",
+}
+
+
+def _fts_sql(role_clause: str, kind_clause: str, recent: bool, text_sql: str) -> str:
+    order = "score DESC NULLS LAST, event_ts DESC NULLS LAST"
+    if recent:
+        order = "event_ts DESC NULLS LAST, score DESC NULLS LAST"
+    # Score the matching docs once, filter and rank them with their metadata, cut to
+    # `limit`, and only then join docs_text so the excerpt is computed for those rows alone.
+    return f"""
+        WITH {_FTS_SCORES_CTES},
+        top AS (
+          SELECT
+            d.doc_id, d.session_id, d.event_ts, d.role, d.kind, d.file_path, d.line_no, s.score
+          FROM scores s
+          JOIN docs d ON d.doc_id = s.doc_id
+          WHERE {role_clause}
+            AND {kind_clause}
+          ORDER BY {order}
+          LIMIT ?
+        )
+        SELECT
+          d.doc_id::VARCHAR,
+          d.session_id,
+          d.event_ts,
+          d.role,
+          d.kind,
+          d.file_path,
+          d.line_no,
+          d.score,{text_sql}
+        FROM top d
+        JOIN docs_text t ON t.doc_id = d.doc_id
+        ORDER BY {order}
+        """
+
+
+def _substring_sql(role_clause: str, kind_clause: str, recent: bool, text_sql: str) -> str:
+    order = "match_pos ASC NULLS LAST, event_ts DESC NULLS LAST"
+    if recent:
+        order = "event_ts DESC NULLS LAST, match_pos ASC NULLS LAST"
+    # Like _fts_sql: rank and cut to `limit` first, then join docs_text again so the excerpt
+    # is computed for those rows alone rather than for every match.
+    return f"""
+        WITH top AS (
+          SELECT
+            d.doc_id, d.session_id, d.event_ts, d.role, d.kind, d.file_path, d.line_no,
+            instr(t.text_lower, ?) AS match_pos
+          FROM docs d
+          JOIN docs_text t ON t.doc_id = d.doc_id
+          WHERE {role_clause}
+            AND {kind_clause}
+            AND contains(t.text_lower, ?)
+          ORDER BY {order}
+          LIMIT ?
+        )
+        SELECT
+          d.doc_id::VARCHAR,
+          d.session_id,
+          d.event_ts,
+          d.role,
+          d.kind,
+          d.file_path,
+          d.line_no,
+          d.match_pos,{text_sql}
+        FROM top d
+        JOIN docs_text t ON t.doc_id = d.doc_id
+        ORDER BY {order}
+        """
+
+
+def _sql_variants(build: Callable[[str, str, bool, str], str]) -> dict[tuple[bool, ...], str]:
+    # Every (include_assistant, include_internal, sort == "recent", include_text) combination,
+    # built once at import so a search only looks its statement up.
+    return {
+        (assistant, internal, recent, full): build(
+            _ROLE_CLAUSES[assistant],
+            _KIND_CLAUSES[internal],
+            recent,
+            _FULL_TEXT_SQL if full else _EXCERPT_SQL,
+        )
+        for assistant, internal, recent, full in product((False, True), repeat=4)
+    }
+
+
+_FTS_SQL = _sql_variants(_fts_sql)
+_SUBSTRING_SQL = _sql_variants(_substring_sql)
+
+
+# Recent results per pooled read-only connection (see db.pooled_read_only), for library
+# callers that repeat a query on one handle (paging, re-rendering in another format). The file
+# can't change under such a handle: another process can't open it for writing while it is
+# open, and in this process db.connect releases it first. So entries never go stale and no
+# invalidation is needed. Other connections can write, or see writes, so they aren't cached.
+# A one-shot CLI search gains nothing; the cache only helps long-lived callers.
+RESULT_CACHE_SIZE = 128
+_CacheEntry = tuple[list[SearchResult], str]
+_RESULT_CACHE: weakref.WeakKeyDictionary[Any, OrderedDict[tuple, _CacheEntry]] = (
+    weakref.WeakKeyDictionary()
+)
+
+
 def search(
     con: Any,
     *,
@@ -117,114 +320,115 @@ def search(
     """
     q = query.strip()
     if not q:
-        return ([], "fts" if is_fts_available(con) else "substring")
+        return ([], "fts" if fts_state(con)[0] else "substring")
 
+    fts_ok, fts_index_ready = fts_state(con)
     # Ensure we have an up-to-date sense of fts availability for this connection.
-    if not is_fts_available(con):
-        try_enable_fts(con)
+    if not fts_ok:
+        fts_ok = try_enable_fts(con)
 
-    role_clause = "role = 'user'"
-    if include_assistant:
-        role_clause = "(role = 'user' OR role = 'assistant' OR role IS NULL)"
+    def run() -> tuple[list[SearchResult], str]:
+        return _search(
+            con,
+            q=q,
+            limit=limit,
+            include_assistant=include_assistant,
+            include_internal=include_internal,
+            sort=sort,
+            include_text=include_text,
+            fts_ok=fts_ok,
+            fts_index_ready=fts_index_ready,
+        )
 
-    kind_clause = "(kind IN ('message_content','message_summary'))"
-    if include_internal:
-        kind_clause = "(1=1)"
+    if not is_pooled_read_only(con):
+        return run()
 
-    fts_index_ready = get_setting(con, "fts_index_ready") == "1"
+    key = (q, limit, include_assistant, include_internal, sort, include_text, fts_ok)
+    cache = _RESULT_CACHE.get(con)
+    if cache is None:
+        cache = _RESULT_CACHE[con] = OrderedDict()
+    hit = cache.get(key)
+    if hit is not None:
+        cache.move_to_end(key)
+        # SearchResult is immutable; copy the list so callers can't reorder the cached one.
+        return (list(hit[0]), hit[1])
 
-    if is_fts_available(con) and fts_index_ready:
-        order = "score DESC NULLS LAST, d.event_ts DESC NULLS LAST"
-        if sort == "recent":
-            order = "d.event_ts DESC NULLS LAST, score DESC NULLS LAST"
-        sql = f"""
-        SELECT
-          d.doc_id,
-          d.session_id,
-          d.event_ts,
-          d.role,
-          d.kind,
-          d.file_path,
-          d.line_no,
-          fts_main_docs.match_bm25(d.doc_id, ?) AS score,
-          d.text,
-          NULL::INTEGER AS match_pos
-        FROM docs d
-        WHERE {role_clause}
-          AND {kind_clause}
-          AND fts_main_docs.match_bm25(d.doc_id, ?) IS NOT NULL
-        ORDER BY {order}
-        LIMIT ?
-        """
+    results, mode = run()
+    cache[key] = (results, mode)
+    if len(cache) > RESULT_CACHE_SIZE:
+        cache.popitem(last=False)
+    return (list(results), mode)
+
+
+def _search(
+    con: Any,
+    *,
+    q: str,
+    limit: int,
+    include_assistant: bool,
+    include_internal: bool,
+    sort: str,
+    include_text: bool,
+    fts_ok: bool,
+    fts_index_ready: bool,
+) -> tuple[list[SearchResult], str]:
+
+    variant = (include_assistant, include_internal, sort == "recent", include_text)
+    # Snippet needles for every row (and the excerpt window), computed once per query.
+    needles = _snippet_needles(q)
+    # Full text only when the caller wants it; otherwise just the excerpt the snippet comes from.
+    text_params = [] if include_text else [needles]
+
+    if fts_ok and fts_index_ready:
+        sql = _FTS_SQL[variant]
         try:
-            rows = con.execute(sql, [q, q, limit]).fetchall()
+            rows = con.execute(sql, [q, limit, *text_params]).fetchall()
         except Exception:
             # Most commonly: index not created yet (no refresh --reindex) or extension limitations.
             rows = []
             fts_index_ready = False
-        results: list[SearchResult] = []
-        for (doc_id, session_id, event_ts, role, kind, file_path, line_no, score, text, match_pos) in rows:
-            raw_text = str(text)
-            results.append(
-                SearchResult(
-                    doc_id=str(doc_id),
-                    session_id=session_id if isinstance(session_id, str) else None,
-                    event_ts=event_ts,
-                    role=role if isinstance(role, str) else None,
-                    kind=str(kind),
-                    file_path=str(file_path),
-                    line_no=int(line_no),
-                    score=float(score) if score is not None else None,
-                    match_pos=None,
-                    snippet=_make_snippet(raw_text, q),
-                    text=raw_text if include_text else None,
-                )
+        # Columns come back typed (VARCHAR doc_id, BIGINT line_no, DOUBLE score), so rows map
+        # straight onto SearchResult without per-field coercion.
+        results = [
+            SearchResult(
+                doc_id,
+                session_id,
+                event_ts,
+                role,
+                kind,
+                file_path,
+                line_no,
+                score,
+                None,
+                _excerpt_snippet(text, win_start, text_len, q, needles),
+                text if include_text else None,
             )
+            for (doc_id, session_id, event_ts, role, kind, file_path, line_no, score, win_start, text, text_len) in rows
+        ]
         if results:
             return (results, "fts")
         # Fall through to substring if FTS yields nothing due to missing index.
 
     # Fallback: substring search
-    order = "match_pos ASC NULLS LAST, event_ts DESC NULLS LAST"
-    if sort == "recent":
-        order = "event_ts DESC NULLS LAST, match_pos ASC NULLS LAST"
-
-    text_expr = "text"
-    if not include_text:
-        # Still needed for snippet generation, but we can keep it in the row and drop later.
-        text_expr = "text"
-
+    # docs_text.text_lower holds text.lower(); lower the query the same way, once.
+    q_lower = q.lower()
     rows = con.execute(
-        f"""
-        SELECT
-          doc_id, session_id, event_ts, role, kind, file_path, line_no,
-          {text_expr} AS text,
-          instr(lower(text), lower(?)) AS match_pos
-        FROM docs
-        WHERE {role_clause}
-          AND {kind_clause}
-          AND lower(text) LIKE '%' || lower(?) || '%'
-        ORDER BY {order}
-        LIMIT ?
-        """,
-        [q, q, limit],
+        _SUBSTRING_SQL[variant], [q_lower, q_lower, limit, *text_params]
     ).fetchall()
-    results = []
-    for (doc_id, session_id, event_ts, role, kind, file_path, line_no, text, match_pos) in rows:
-        raw_text = str(text)
-        results.append(
-            SearchResult(
-                doc_id=str(doc_id),
-                session_id=session_id if isinstance(session_id, str) else None,
-                event_ts=event_ts,
-                role=role if isinstance(role, str) else None,
-                kind=str(kind),
-                file_path=str(file_path),
-                line_no=int(line_no),
-                score=None,
-                match_pos=int(match_pos) if match_pos is not None else None,
-                snippet=_make_snippet(raw_text, q),
-                text=raw_text if include_text else None,
-            )
+    results = [
+        SearchResult(
+            doc_id,
+            session_id,
+            event_ts,
+            role,
+            kind,
+            file_path,
+            line_no,
+            None,
+            match_pos,
+            _excerpt_snippet(text, win_start, text_len, q, needles),
+            text if include_text else None,
         )
+        for (doc_id, session_id, event_ts, role, kind, file_path, line_no, match_pos, win_start, text, text_len) in rows
+    ]
     return (results, "substring")
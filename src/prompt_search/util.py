@@ -1,17 +1,39 @@
 from __future__ import annotations
 
+import hashlib
 import json
+import sys
 from dataclasses import dataclass
-from datetime import datetime, timezone
+from datetime import date, datetime, timezone
 from typing import Any
 
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson ships wheels for all mainstream platforms
+    orjson = None
 
-def parse_ts(ts: str | None) -> datetime | None:
-    if not ts:
+try:
+    # Optional C parser for ISO-8601 timestamps; several times faster than fromisoformat.
+    from ciso8601 import parse_datetime as _parse_iso
+except ImportError:
+    _parse_iso = None
+
+# Python 3.11+ parses a trailing "Z" natively.
+_FROMISO_HANDLES_Z = sys.version_info >= (3, 11)
+
+
+def parse_ts(ts: Any) -> datetime | None:
+    if not ts or not isinstance(ts, str):
         return None
     # Codex JSONL uses ISO strings like "2025-11-05T02:19:10.108Z".
+    if _parse_iso is not None:
+        try:
+            return _parse_iso(ts)
+        except ValueError:
+            # Fall through: fromisoformat accepts a few shapes ciso8601 doesn't.
+            pass
     s = ts.strip()
-    if s.endswith("Z"):
+    if not _FROMISO_HANDLES_Z and s.endswith("Z"):
         s = s[:-1] + "+00:00"
     try:
         return datetime.fromisoformat(s)
@@ -23,18 +45,67 @@ def utcnow() -> datetime:
     return datetime.now(timezone.utc)
 
 
+def _json_default(obj: Any) -> Any:
+    # Mirror orjson's native datetime handling for the stdlib fallback.
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def json_loads(data: bytes | str) -> Any:
+    # Both parsers accept UTF-8 bytes, so JSONL lines can be parsed without decoding first.
+    # Errors are ValueError subclasses either way.
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
 def json_dumps_compact(obj: Any) -> str:
-    return json.dumps(obj, ensure_ascii=True, separators=(",", ":"), sort_keys=True)
+    # Sorted keys; non-ASCII stays UTF-8 with either encoder (orjson has no escaping option).
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS).decode()
+        except TypeError:
+            # e.g. non-str keys or ints beyond 64 bits; the stdlib handles those.
+            pass
+    return json.dumps(
+        obj, ensure_ascii=False, separators=(",", ":"), sort_keys=True, default=_json_default
+    )
+
+
+def json_dumps_fast(obj: Any) -> str:
+    # For output nobody diffs or hashes: json_dumps_compact without sorting the keys.
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj).decode()
+        except TypeError:
+            pass
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=_json_default)
 
 
 def json_dumps_pretty(obj: Any) -> str:
-    return json.dumps(obj, ensure_ascii=True, indent=2, sort_keys=True)
+    # json_dumps_compact indented by two spaces.
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_SORT_KEYS).decode()
+        except TypeError:
+            pass
+    return json.dumps(obj, ensure_ascii=False, indent=2, sort_keys=True, default=_json_default)
 
 
-@dataclass(frozen=True)
+def hash_key(key: str) -> int:
+    # Doc ids: 64-bit hash of "path:line:segment", stored as a signed BIGINT. Much smaller than
+    # the string it replaces (long session paths repeated per doc); collisions are negligible
+    # at realistic doc counts. Takes the formatted key so callers can build the "path:line:"
+    # prefix once per event.
+    digest = hashlib.blake2b(key.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big", signed=True)
+
+
+@dataclass(frozen=True, slots=True)
 class ExtractedDoc:
-    # Stable primary key (derived from file/line/segment).
-    doc_id: str
+    # Stable primary key (derived from file/line/segment, see `hash_key`).
+    doc_id: int
 
     session_id: str | None
     file_path: str
@@ -45,4 +116,3 @@ class ExtractedDoc:
     role: str | None
     kind: str
     text: str
-
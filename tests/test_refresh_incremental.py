@@ -1,11 +1,20 @@
 from __future__ import annotations
 
 import json
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import timedelta
 from pathlib import Path
 
+import duckdb
+import pytest
+from typer.testing import CliRunner
+
+from prompt_search.cli import app
 from prompt_search.ingest import refresh
 from prompt_search.paths import db_path
 from prompt_search.search import search as search_impl
+from prompt_search import db as dbmod, ingest
 from prompt_search.db import connect, ensure_schema, try_enable_fts, is_fts_available
 
 
@@ -89,3 +98,420 @@ def test_fts_optional(tmp_path: Path) -> None:
     ensure_schema(con)
     ok = try_enable_fts(con)
     assert is_fts_available(con) == ok
+    # Memoized per connection, but a reset of the setting still gets re-recorded.
+    dbmod.set_setting(con, "fts_available", "0")
+    assert try_enable_fts(con) == ok
+    assert is_fts_available(con) == ok
+
+
+def test_fts_state_is_cached_until_settings_change() -> None:
+    con = duckdb.connect(":memory:")
+    ensure_schema(con)
+    dbmod.set_setting(con, "fts_available", "1")
+    assert dbmod.fts_state(con) == (True, False)
+
+    # Reads are served from the cache; writing an FTS setting drops it.
+    con.execute("UPDATE settings SET value = '0' WHERE key = 'fts_available'")
+    assert dbmod.fts_state(con) == (True, False)
+    dbmod.set_setting(con, "fts_index_ready", "1")
+    assert dbmod.fts_state(con) == (False, True)
+
+
+def test_bulk_insert_docs_without_pyarrow(tmp_path: Path, monkeypatch) -> None:
+    # The multi-row VALUES fallback must behave like the Arrow path, including OR IGNORE.
+    monkeypatch.setattr(dbmod, "pa", None)
+    con = connect(db_path(tmp_path))
+    ensure_schema(con)
+    rows = [
+        (1, "s1", "f", 1, None, "response_item", "message", "user", "message_content", "a", 1),
+        (2, "s1", "f", 2, None, "response_item", "message", "user", "message_content", "bb", 2),
+    ]
+    assert dbmod.bulk_insert_docs(con, rows) == 2
+    dbmod.bulk_insert_docs(con, rows[:1])
+    assert con.execute("SELECT doc_id, text_len FROM docs_text ORDER BY doc_id").fetchall() == [
+        (1, 1),
+        (2, 2),
+    ]
+
+
+def test_fresh_ingest_drops_repeated_doc_ids() -> None:
+    # Without OR IGNORE on a fresh ingest, duplicate ids must already be gone before the insert.
+    seen: set[int] = set()
+    cols = [[1, 2], ["a", "b"]]
+    assert ingest._drop_seen_docs(cols, seen) is cols
+    assert ingest._drop_seen_docs([[2, 3, 3], ["b", "c", "d"]], seen) == [[3], ["c"]]
+    assert seen == {1, 2, 3}
+
+
+def test_write_connection_limits_from_env(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setenv("PROMPT_SEARCH_THREADS", "2")
+    monkeypatch.setenv("PROMPT_SEARCH_MEMORY_LIMIT", "1GB")
+    con = connect(db_path(tmp_path))
+    threads, preserve = con.execute(
+        "SELECT current_setting('threads'), current_setting('preserve_insertion_order')"
+    ).fetchone()
+    assert (threads, preserve) == (2, False)
+    con.close()
+
+
+def test_read_only_connections_are_pooled(tmp_path: Path) -> None:
+    sessions_dir = tmp_path / "sessions"
+    data_dir = tmp_path / "data"
+    _write_jsonl(sessions_dir / "a.jsonl", [])
+    refresh(sessions_dir=sessions_dir, data_dir=data_dir, reindex=False)
+
+    db_file = db_path(data_dir)
+    # Plain read-only connections stay caller-owned: closing one affects nothing else.
+    own = dbmod.connect_read_only(db_file)
+    assert dbmod.connect_read_only(db_file) is not own
+    own.close()
+
+    ro1 = dbmod.pooled_read_only(db_file)
+    assert dbmod.pooled_read_only(db_file) is ro1
+    # Each thread gets its own handle.
+    with ThreadPoolExecutor(1) as pool:
+        assert pool.submit(dbmod.pooled_read_only, db_file).result() is not ro1
+    # A pooled handle a caller closed anyway is replaced rather than handed out again.
+    ro1.close()
+    ro2 = dbmod.pooled_read_only(db_file)
+    assert ro2 is not ro1 and ro2.execute("SELECT 1").fetchone() == (1,)
+
+    # A writer in the same process evicts and closes the pooled read-only handles.
+    refresh(sessions_dir=sessions_dir, data_dir=data_dir, reindex=False)
+    with pytest.raises(duckdb.ConnectionException):
+        ro2.execute("SELECT 1")
+    assert dbmod._RO_POOL == {}
+    assert dbmod.pooled_read_only(db_file) is not ro2
+    dbmod.close_all()
+
+
+def test_cli_releases_read_only_pool(tmp_path: Path) -> None:
+    data_dir = tmp_path / "data"
+    refresh(sessions_dir=tmp_path / "sessions", data_dir=data_dir, reindex=False)
+
+    result = CliRunner().invoke(app, ["list-sessions", "--data-dir", str(data_dir), "--json"])
+    assert result.exit_code == 0, result.output
+    # Nothing left holding the file lock once the command has returned.
+    assert dbmod._RO_POOL == {}
+
+
+def test_open_with_backoff_retries_lock_conflicts() -> None:
+    calls = []
+
+    def opener():
+        calls.append(1)
+        if len(calls) < 3:
+            raise RuntimeError("IO Error: Could not set lock on file: Conflicting lock is held")
+        return "con"
+
+    assert dbmod.open_with_backoff(opener, timeout=1.0) == "con"
+    assert len(calls) == 3
+
+
+def test_session_counts_follow_appends_and_truncation(tmp_path: Path) -> None:
+    sessions_dir = tmp_path / "sessions"
+    data_dir = tmp_path / "data"
+    f1 = sessions_dir / "s.jsonl"
+    meta = {
+        "timestamp": "2025-11-05T02:19:10.108Z",
+        "type": "session_meta",
+        "payload": {"id": "sess-1", "timestamp": "2025-11-05T02:19:10.079Z"},
+    }
+
+    def msg(role: str, text: str) -> dict:
+        return {
+            "timestamp": "2025-11-05T02:19:11.000Z",
+            "type": "response_item",
+            "payload": {"type": "message", "role": role, "content": [{"text": text}]},
+        }
+
+    _write_jsonl(f1, [meta, msg("user", "one")])
+    refresh(sessions_dir=sessions_dir, data_dir=data_dir, reindex=False)
+    _append_jsonl(f1, [msg("assistant", "two"), msg("user", "three")])
+    refresh(sessions_dir=sessions_dir, data_dir=data_dir, reindex=False)
+
+    con = connect(db_path(data_dir))
+    counts = "SELECT user_docs, assistant_docs, internal_docs FROM session_counts"
+    assert con.execute(counts).fetchall() == [(2, 1, 0)]
+    con.close()
+
+    # Shrinking the file drops its docs, and the cached counts with them.
+    _write_jsonl(f1, [meta])
+    refresh(sessions_dir=sessions_dir, data_dir=data_dir, reindex=False)
+    con = connect(db_path(data_dir))
+    assert con.execute(counts).fetchall() == []
+
+
+def test_truncate_and_restore_without_reindex(tmp_path: Path) -> None:
+    sessions_dir = tmp_path / "sessions"
+    data_dir = tmp_path / "data"
+    f1 = sessions_dir / "s.jsonl"
+    event = {
+        "type": "response_item",
+        "payload": {"type": "message", "role": "user", "content": [{"text": "kept queued"}]},
+    }
+    _write_jsonl(f1, [event])
+    refresh(sessions_dir=sessions_dir, data_dir=data_dir, reindex=False)
+
+    # Emptying the file empties docs, which puts the next refresh on the plain-INSERT path;
+    # the doc's fts_pending entry must have gone with it.
+    _write_jsonl(f1, [])
+    refresh(sessions_dir=sessions_dir, data_dir=data_dir, reindex=False)
+    _write_jsonl(f1, [event])
+    stats = refresh(sessions_dir=sessions_dir, data_dir=data_dir, reindex=False)
+    assert stats.docs_inserted == 1
+
+    con = connect(db_path(data_dir))
+    assert con.execute("SELECT COUNT(*) FROM fts_pending").fetchone()[0] == 1
+
+
+def test_fts_follows_truncate_and_rewrite(tmp_path: Path) -> None:
+    sessions_dir = tmp_path / "sessions"
+    data_dir = tmp_path / "data"
+
+    def msg(text: str) -> dict:
+        return {
+            "type": "response_item",
+            "payload": {"type": "message", "role": "user", "content": [{"text": text}]},
+        }
+
+    # Enough other docs that the rewritten one alone would be appended, not rebuilt.
+    _write_jsonl(sessions_dir / "other.jsonl", [msg(f"filler {i}") for i in range(10)])
+    f1 = sessions_dir / "s.jsonl"
+    _write_jsonl(f1, [msg("apple pie")])
+    stats = refresh(sessions_dir=sessions_dir, data_dir=data_dir)
+    if not stats.fts_available:
+        pytest.skip("fts extension unavailable")
+
+    _write_jsonl(f1, [])
+    refresh(sessions_dir=sessions_dir, data_dir=data_dir)
+    # Same path and line, so the same doc_id, with different text.
+    _write_jsonl(f1, [msg("zebra zucchini")])
+    refresh(sessions_dir=sessions_dir, data_dir=data_dir)
+
+    con = connect(db_path(data_dir))
+
+    def find(query: str) -> tuple[list[str], str]:
+        results, mode = search_impl(
+            con, query=query, limit=10, include_assistant=False, include_internal=False
+        )
+        return [r.snippet for r in results], mode
+
+    assert find("apple") == ([], "substring")
+    assert find("zucchini") == (["zebra zucchini"], "fts")
+
+
+def test_refresh_session_counts_filtered_matches_full(monkeypatch) -> None:
+    con = duckdb.connect(":memory:")
+    ensure_schema(con)
+    con.execute(
+        "INSERT INTO docs SELECT i, 's' || (i % 4), 'f', i, NULL, 'e', 'm', "
+        "CASE WHEN i % 3 = 0 THEN 'assistant' ELSE 'user' END, 'message_content' FROM range(40) t(i)"
+    )
+    dbmod.refresh_session_counts(con)
+    full = con.execute("SELECT * FROM session_counts ORDER BY session_id").fetchall()
+
+    con.execute("DELETE FROM session_counts")
+    dbmod.refresh_session_counts(con, ["s1", "s3"])
+    assert con.execute("SELECT session_id FROM session_counts ORDER BY 1").fetchall() == [
+        ("s1",),
+        ("s3",),
+    ]
+    # Above the threshold the set is ignored and every session is recomputed.
+    monkeypatch.setattr(dbmod, "SESSION_COUNTS_FILTER_MAX", 1)
+    dbmod.refresh_session_counts(con, ["s1", "s3"])
+    assert con.execute("SELECT * FROM session_counts ORDER BY session_id").fetchall() == full
+
+
+def test_refresh_tolerates_invalid_utf8(tmp_path: Path) -> None:
+    sessions_dir = tmp_path / "sessions"
+    data_dir = tmp_path / "data"
+    f1 = sessions_dir / "s.jsonl"
+    f1.parent.mkdir(parents=True)
+    event = {
+        "type": "response_item",
+        "payload": {"type": "message", "role": "user", "content": [{"text": "bad BYTE here"}]},
+    }
+    f1.write_bytes(json.dumps(event).encode().replace(b"BYTE", b"\xff") + b"\n")
+
+    stats = refresh(sessions_dir=sessions_dir, data_dir=data_dir, reindex=False)
+    assert stats.docs_inserted == 1
+    con = connect(db_path(data_dir))
+    assert con.execute("SELECT text FROM docs_text").fetchone()[0] == "bad � here"
+
+
+def test_refresh_skips_blank_lines_and_stops_at_partial_line(tmp_path: Path) -> None:
+    sessions_dir = tmp_path / "sessions"
+    data_dir = tmp_path / "data"
+    f1 = sessions_dir / "s.jsonl"
+    f1.parent.mkdir(parents=True)
+    event = {
+        "type": "response_item",
+        "payload": {"type": "message", "role": "user", "content": [{"text": "after blanks"}]},
+    }
+    f1.write_bytes(b"\n  \t\r\n" + json.dumps(event).encode() + b"\n" + b'{"type": "respo')
+
+    stats = refresh(sessions_dir=sessions_dir, data_dir=data_dir, reindex=False)
+    assert stats.docs_inserted == 1
+    con = connect(db_path(data_dir))
+    assert con.execute("SELECT line_no FROM docs").fetchall() == [(3,)]
+    assert con.execute("SELECT last_line_no FROM session_files").fetchone()[0] == 3
+
+
+def test_schema_version_change_drops_derived_tables(tmp_path: Path) -> None:
+    con = connect(db_path(tmp_path))
+    con.execute("CREATE TABLE settings (key VARCHAR PRIMARY KEY, value VARCHAR)")
+    con.execute("INSERT INTO settings VALUES ('schema_version', '1')")
+    con.execute("CREATE TABLE docs (doc_id VARCHAR PRIMARY KEY, text VARCHAR)")
+    con.execute("INSERT INTO docs VALUES ('/old/path.jsonl:1:1', 'stale')")
+
+    ensure_schema(con)
+    assert dbmod.get_setting(con, "schema_version") == str(dbmod.SCHEMA_VERSION)
+    assert con.execute("SELECT COUNT(*) FROM docs").fetchone()[0] == 0
+
+
+def test_incremental_fts_update_matches_full_rebuild(tmp_path: Path) -> None:
+    words = ["duckdb", "index", "search", "the", "running", "runs", "python", "don't", "é", "42"]
+    rows = [
+        (i, "s1", "f", i, None, "response_item", "message", "user", "message_content", text, len(text))
+        for i in range(40)
+        for text in [" ".join(words[j % len(words)] for j in range(i, i + i % 7))]
+    ]
+
+    def build(name: str, batches: list[list[tuple]]) -> tuple[duckdb.DuckDBPyConnection, list[bool]]:
+        con = connect(tmp_path / name)
+        ensure_schema(con)
+        if not try_enable_fts(con):
+            pytest.skip("fts extension unavailable")
+        appended = []
+        for batch in batches:
+            dbmod.bulk_insert_docs(con, batch)
+            appended.append(dbmod.update_fts_index(con))
+        return con, appended
+
+    inc, appended = build("inc.duckdb", [rows[:35], rows[35:38], rows[38:]])
+    full, _ = build("full.duckdb", [rows])
+    assert appended == [False, True, True]
+    assert inc.execute("SELECT COUNT(*) FROM fts_pending").fetchone()[0] == 0
+
+    sql = "SELECT doc_id, fts_main_docs_text.match_bm25(doc_id, ?) FROM docs_text ORDER BY doc_id"
+    for q in ["duckdb", "running python", "don't", "42 é"]:
+        assert inc.execute(sql, [q]).fetchall() == pytest.approx(full.execute(sql, [q]).fetchall())
+
+
+def test_fts_search_scores_match_match_bm25(tmp_path: Path) -> None:
+    con = connect(tmp_path / "db.duckdb")
+    ensure_schema(con)
+    if not try_enable_fts(con):
+        pytest.skip("fts extension unavailable")
+    texts = ["duckdb search", "running duckdb runs", "python", "the search index", "runs and runs"]
+    dbmod.bulk_insert_docs(
+        con,
+        [
+            (i, "s1", "f", i, None, "response_item", "message", "user", "message_content", t, len(t))
+            for i, t in enumerate(texts)
+        ],
+    )
+    dbmod.rebuild_fts_index(con)
+
+    sql = """
+        SELECT doc_id::VARCHAR, score FROM (
+          SELECT doc_id, fts_main_docs_text.match_bm25(doc_id, ?) AS score FROM docs_text
+        ) WHERE score IS NOT NULL ORDER BY score DESC, doc_id
+    """
+    for q in ["duckdb", "run search", "python index"]:
+        results, mode = search_impl(
+            con, query=q, limit=10, include_assistant=False, include_internal=False
+        )
+        assert mode == "fts"
+        got = sorted(((r.doc_id, r.score) for r in results), key=lambda x: (-x[1], x[0]))
+        assert got == pytest.approx(con.execute(sql, [q]).fetchall())
+
+
+def test_repeated_session_meta_is_merged(tmp_path: Path) -> None:
+    sessions_dir = tmp_path / "sessions"
+    data_dir = tmp_path / "data"
+
+    def meta(ts: str, **fields: str) -> dict:
+        return {"timestamp": ts, "type": "session_meta", "payload": {"id": "sess-1", "timestamp": ts, **fields}}
+
+    _write_jsonl(
+        sessions_dir / "a.jsonl",
+        [meta("2025-11-05T02:00:00Z", cwd="/a"), meta("2025-11-05T01:00:00Z", originator="cli")],
+    )
+    _write_jsonl(sessions_dir / "b.jsonl", [meta("2025-11-05T03:00:00Z", cwd="/b")])
+    stats = refresh(sessions_dir=sessions_dir, data_dir=data_dir, reindex=False)
+    assert stats.sessions_upserted == 3
+
+    con = connect(db_path(data_dir))
+    first_ts, last_ts, cwd, originator = con.execute(
+        "SELECT first_ts, last_ts, cwd, originator FROM sessions"
+    ).fetchone()
+    assert last_ts - first_ts == timedelta(hours=2)
+    assert (cwd, originator) == ("/b", "cli")
+
+
+def test_parallel_parse_matches_sequential(tmp_path: Path, monkeypatch) -> None:
+    sessions_dir = tmp_path / "sessions"
+    # More files than the 2 workers' window holds, so results are yielded while others parse.
+    for i in range(6):
+        _write_jsonl(
+            sessions_dir / f"{i}.jsonl",
+            [
+                {"timestamp": "2025-11-05T02:00:00Z", "type": "session_meta", "payload": {"id": f"sess-{i}"}},
+                {
+                    "timestamp": "2025-11-05T02:00:01Z",
+                    "type": "response_item",
+                    "payload": {"type": "message", "role": "user", "content": [{"text": f"hello {i}"}]},
+                },
+            ],
+        )
+
+    def snapshot(data_dir: Path) -> tuple[list, list, list]:
+        con = connect(db_path(data_dir))
+        out = (
+            con.execute("SELECT doc_id, session_id, line_no FROM docs ORDER BY doc_id").fetchall(),
+            con.execute("SELECT path, session_id, last_offset, last_line_no FROM session_files ORDER BY path").fetchall(),
+            con.execute("SELECT session_id, first_ts FROM sessions ORDER BY session_id").fetchall(),
+        )
+        con.close()
+        return out
+
+    seq = refresh(sessions_dir=sessions_dir, data_dir=tmp_path / "seq", reindex=False)
+    monkeypatch.setattr(ingest, "_parse_workers", lambda n_files: 2)
+    # Library calls parse in-process unless they opt in.
+    refresh(sessions_dir=sessions_dir, data_dir=tmp_path / "lib", reindex=False)
+    assert snapshot(tmp_path / "lib") == snapshot(tmp_path / "seq")
+    par = refresh(
+        sessions_dir=sessions_dir, data_dir=tmp_path / "par", reindex=False, parallel=True
+    )
+    assert (par.docs_inserted, par.lines_read) == (seq.docs_inserted, seq.lines_read) == (6, 12)
+    assert snapshot(tmp_path / "par") == snapshot(tmp_path / "seq")
+
+    # Workers that can't start (an unguarded __main__ under spawn) fall back to in-process
+    # parsing, including for jobs whose results were already consumed.
+    class BrokenPool:
+        def __init__(self, *args, **kwargs):
+            self.submitted = 0
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            return False
+
+        def submit(self, fn, job):
+            fut = Future()
+            self.submitted += 1
+            if self.submitted <= 2:
+                fut.set_result(fn(job))
+            else:
+                fut.set_exception(BrokenProcessPool("child process terminated abruptly"))
+            return fut
+
+    monkeypatch.setattr(ingest, "ProcessPoolExecutor", BrokenPool)
+    broken = refresh(
+        sessions_dir=sessions_dir, data_dir=tmp_path / "broken", reindex=False, parallel=True
+    )
+    assert broken.docs_inserted == 6
+    assert snapshot(tmp_path / "broken") == snapshot(tmp_path / "seq")
@@ -1,6 +1,11 @@
 from __future__ import annotations
 
-from prompt_search.render import find_match_spans, highlight_snippet_markdown
+import json
+from datetime import datetime
+
+from prompt_search import util
+from prompt_search.render import find_match_spans, highlight_snippet_markdown, render_search_results
+from prompt_search.search import SearchResult
 
 
 def test_find_match_spans_basic() -> None:
@@ -26,3 +31,39 @@ def test_highlight_markdown_inserts_bold() -> None:
     out = highlight_snippet_markdown(s, "duckdb")
     assert out == "hello **duckdb** world"
 
+
+def test_render_json_serializes_datetimes() -> None:
+    r = SearchResult(
+        doc_id="d1",
+        session_id="s1",
+        event_ts=datetime(2026, 1, 2, 3, 4, 5),
+        role="user",
+        kind="message_content",
+        file_path="f",
+        line_no=1,
+        score=None,
+        match_pos=1,
+        snippet="hello duckdb",
+        text=None,
+    )
+    out = render_search_results(
+        results=[r], mode="substring", query="duckdb", output_format="json", color="never"
+    )
+    payload = json.loads(out)
+    assert payload["results"][0]["event_ts"] == "2026-01-02T03:04:05"
+    assert payload["results"][0]["match_pos"] == 1
+
+
+def test_json_dumps_same_utf8_with_or_without_orjson(monkeypatch) -> None:
+    objs = [
+        {"b": "café ☕ 😀", "a": [1, None], "ts": datetime(2026, 1, 2, 3, 4, 5)},
+        {"b": "plain", "a": {}, "ts": datetime(2026, 1, 2, 3, 4, 5, 600)},
+    ]
+
+    def dumps() -> list[tuple[str, str]]:
+        return [(util.json_dumps_compact(o), util.json_dumps_pretty(o)) for o in objs]
+
+    with_orjson = dumps()
+    monkeypatch.setattr(util, "orjson", None)
+    assert with_orjson == dumps()
+    assert with_orjson[0][0] == '{"a":[1,null],"b":"café ☕ 😀","ts":"2026-01-02T03:04:05"}'
@@ -1,9 +1,13 @@
 from __future__ import annotations
 
+import json
+from datetime import datetime
+
 import duckdb
 
-from prompt_search.search import extract_context_lines, search as search_impl
-from prompt_search.db import ensure_schema, set_setting
+from prompt_search import db as dbmod, search as search_mod
+from prompt_search.search import _make_snippet, extract_context_lines, search as search_impl
+from prompt_search.db import bulk_insert_docs, ensure_schema, set_setting
 
 
 def _setup(con: duckdb.DuckDBPyConnection) -> None:
@@ -14,22 +18,34 @@ def _setup(con: duckdb.DuckDBPyConnection) -> None:
     con.execute("DELETE FROM sessions")
 
 
+def _insert(con: duckdb.DuckDBPyConnection, *docs: tuple[int, datetime, str]) -> None:
+    bulk_insert_docs(
+        con,
+        [
+            (doc_id, "s1", "f", doc_id, ts, "response_item", "message", "user", "message_content", text, len(text))
+            for doc_id, ts, text in docs
+        ],
+    )
+
+
 def test_extract_context_lines_basic() -> None:
     txt = "aaa\nbbb match here\nccc\nddd\n"
     out = extract_context_lines(txt, "match", 1)
     assert out == "aaa\nbbb match here\nccc"
 
 
+def test_make_snippet_collapses_whitespace() -> None:
+    for txt in ["plain prompt", "two  spaces", " lead", "trail ", "tab\there", "cr\rlf", "nb\xa0sp", ""]:
+        assert _make_snippet(txt, "x") == " ".join(txt.split())
+
+
 def test_substring_sort_relevance_uses_match_pos() -> None:
     con = duckdb.connect(":memory:")
     _setup(con)
-    con.execute(
-        """
-        INSERT INTO docs(doc_id, session_id, file_path, line_no, event_ts, event_type, inner_type, role, kind, text, text_len)
-        VALUES
-          ('1', 's1', 'f', 1, '2026-01-01 00:00:00', 'response_item', 'message', 'user', 'message_content', 'zzz needle', 10),
-          ('2', 's1', 'f', 2, '2026-01-02 00:00:00', 'response_item', 'message', 'user', 'message_content', 'needle zzz', 10)
-        """
+    _insert(
+        con,
+        (1, datetime(2026, 1, 1), "zzz needle"),
+        (2, datetime(2026, 1, 2), "needle zzz"),
     )
 
     results, mode = search_impl(
@@ -48,13 +64,10 @@ def test_substring_sort_relevance_uses_match_pos() -> None:
 def test_substring_sort_recent_uses_timestamp() -> None:
     con = duckdb.connect(":memory:")
     _setup(con)
-    con.execute(
-        """
-        INSERT INTO docs(doc_id, session_id, file_path, line_no, event_ts, event_type, inner_type, role, kind, text, text_len)
-        VALUES
-          ('1', 's1', 'f', 1, '2026-01-01 00:00:00', 'response_item', 'message', 'user', 'message_content', 'needle here', 11),
-          ('2', 's1', 'f', 2, '2026-01-03 00:00:00', 'response_item', 'message', 'user', 'message_content', 'needle there', 12)
-        """
+    _insert(
+        con,
+        (1, datetime(2026, 1, 1), "needle here"),
+        (2, datetime(2026, 1, 3), "needle there"),
     )
 
     results, mode = search_impl(
@@ -68,3 +81,135 @@ def test_substring_sort_recent_uses_timestamp() -> None:
     )
     assert mode == "substring"
     assert [r.doc_id for r in results] == ["2", "1"]  # newest first
+
+
+def test_substring_search_is_case_insensitive() -> None:
+    con = duckdb.connect(":memory:")
+    _setup(con)
+    _insert(con, (1, datetime(2026, 1, 1), "Hello DuckDB"), (2, datetime(2026, 1, 2), "unrelated"))
+
+    for query in ("duckdb", "HELLO duck"):
+        results, mode = search_impl(
+            con,
+            query=query,
+            limit=10,
+            include_assistant=False,
+            include_internal=False,
+        )
+        assert mode == "substring"
+        assert [(r.doc_id, r.match_pos) for r in results] == [("1", 7 if query == "duckdb" else 1)]
+
+
+def test_substring_search_treats_wildcards_literally() -> None:
+    con = duckdb.connect(":memory:")
+    _setup(con)
+    _insert(con, (1, datetime(2026, 1, 1), "100% done"), (2, datetime(2026, 1, 2), "1000 done"))
+
+    results, _ = search_impl(
+        con, query="100%", limit=10, include_assistant=False, include_internal=False
+    )
+    assert [r.doc_id for r in results] == ["1"]
+
+
+def test_snippet_from_excerpt_matches_full_text() -> None:
+    con = duckdb.connect(":memory:")
+    _setup(con)
+    words = "alpha beta  gamma\n delta"
+    text = " ".join([words] * 200) + " needle " + " ".join([words] * 200)
+    _insert(con, (1, datetime(2026, 1, 1), text), (2, datetime(2026, 1, 2), "needle " + text))
+
+    def snippets(include_text: bool) -> list[str]:
+        results, _ = search_impl(
+            con,
+            query="needle",
+            limit=10,
+            include_assistant=False,
+            include_internal=False,
+            include_text=include_text,
+        )
+        return [r.snippet for r in results]
+
+    excerpt = snippets(False)
+    assert excerpt == snippets(True)
+    assert excerpt[1].startswith("…") and excerpt[1].endswith("…") and "needle" in excerpt[1]
+
+
+def test_search_results_cached_only_on_pooled_read_only_handles(tmp_path, monkeypatch) -> None:
+    db_file = tmp_path / "db.duckdb"
+    con = duckdb.connect(str(db_file))
+    _setup(con)
+    # Available but not indexed: searches go to substring without trying to record FTS state.
+    set_setting(con, "fts_available", "1")
+    _insert(con, (1, datetime(2026, 1, 1), "needle one"))
+
+    calls = []
+    real_search = search_mod._search
+
+    def counting_search(*args, **kwargs):
+        calls.append(1)
+        return real_search(*args, **kwargs)
+
+    monkeypatch.setattr(search_mod, "_search", counting_search)
+
+    def ids(c: duckdb.DuckDBPyConnection) -> list[str]:
+        results, _ = search_impl(
+            c, query="needle", limit=10, include_assistant=False, include_internal=False
+        )
+        return [r.doc_id for r in results]
+
+    # A writable connection sees its own writes straight away.
+    assert ids(con) == ["1"]
+    _insert(con, (2, datetime(2026, 1, 2), "needle two"))
+    assert ids(con) == ["2", "1"]
+    assert len(calls) == 2
+    con.close()
+
+    # Nothing can write while a pooled read-only handle is open, so repeats are served from cache.
+    ro = dbmod.pooled_read_only(db_file)
+    assert ids(ro) == ids(ro) == ["2", "1"]
+    assert len(calls) == 3
+    dbmod.close_all()
+
+
+def test_snippet_window_survives_non_ascii_prefix() -> None:
+    con = duckdb.connect(":memory:")
+    _setup(con)
+    # "İ" lowers to two characters in Python, so text_lower offsets run ahead of text's.
+    text = "İ" * 600 + " needle " + "tail " * 100
+    _insert(con, (1, datetime(2026, 1, 1), text))
+
+    for include_text in (False, True):
+        results, _ = search_impl(
+            con,
+            query="needle",
+            limit=10,
+            include_assistant=False,
+            include_internal=False,
+            include_text=include_text,
+        )
+        snippet = results[0].snippet
+        assert "needle" in snippet and len(snippet) <= 180
+        assert snippet.startswith("…İ") and snippet.endswith("…")
+
+
+def test_substring_excerpt_computed_only_for_limited_rows(tmp_path) -> None:
+    con = duckdb.connect(":memory:")
+    _setup(con)
+    _insert(con, *[(i, datetime(2026, 1, 1), f"needle {i}") for i in range(50)])
+
+    profile = tmp_path / "profile.json"
+    con.execute("PRAGMA enable_profiling='json'")
+    con.execute(f"PRAGMA profiling_output='{profile}'")
+    results, mode = search_impl(
+        con, query="needle", limit=5, include_assistant=False, include_internal=False
+    )
+    con.execute("PRAGMA disable_profiling")
+    assert (len(results), mode) == (5, "substring")
+
+    # Every operator that handles the excerpt window sees only the `limit` rows.
+    def excerpt_rows(node: dict) -> list[int]:
+        own = [node["operator_cardinality"]] if "win_start" in str(node.get("extra_info")) else []
+        return own + [n for child in node.get("children", []) for n in excerpt_rows(child)]
+
+    rows = excerpt_rows(json.loads(profile.read_text()))
+    assert rows and max(rows) <= 5